@@ -0,0 +1,177 @@
+import asyncio
+import fcntl
+import json
+import math
+import mmap
+import os
+import struct
+import time
+import zlib
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+MUTATING_METHODS = {"POST", "PUT", "PATCH", "DELETE"}
+
+class MemoryBucketStore:
+    """Per-client token buckets for a single worker process."""
+
+    def __init__(self, max_clients: int = 10000):
+        self.max_clients = max_clients
+        self._buckets: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()
+
+    def take(self, client: str, rate: float, burst: float, now: float) -> float:
+        # Returns 0 when a token was taken, otherwise seconds until one is available.
+        tokens, updated = self._buckets.pop(client, (burst, now))
+        tokens, wait = _refill_and_take(tokens, updated, rate, burst, now)
+        self._buckets[client] = (tokens, now)
+        if len(self._buckets) > self.max_clients:
+            self._buckets.popitem(last=False)
+        return wait
+
+class FileBucketStore:
+    """Token buckets in a shared memory-mapped file, for multi-worker setups.
+
+    Clients hash into a fixed table of slots; a slot taken over by another
+    client simply starts a fresh bucket. Access is serialized with flock.
+    """
+
+    SLOT = struct.Struct("<Qdd")
+
+    def __init__(self, path: str, slots: int = 4096):
+        self.slots = slots
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        size = slots * self.SLOT.size
+        if os.fstat(self._fd).st_size < size:
+            os.ftruncate(self._fd, size)
+        self._map = mmap.mmap(self._fd, size)
+
+    def take(self, client: str, rate: float, burst: float, now: float) -> float:
+        key = zlib.crc32(client.encode()) | 1 << 32
+        offset = (key % self.slots) * self.SLOT.size
+        fcntl.flock(self._fd, fcntl.LOCK_EX)
+        try:
+            owner, tokens, updated = self.SLOT.unpack_from(self._map, offset)
+            if owner != key:
+                tokens, updated = burst, now
+            tokens, wait = _refill_and_take(tokens, updated, rate, burst, now)
+            self.SLOT.pack_into(self._map, offset, key, tokens, now)
+        finally:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+        return wait
+
+def _refill_and_take(tokens: float, updated: float, rate: float, burst: float, now: float) -> Tuple[float, float]:
+    tokens = min(burst, tokens + max(0.0, now - updated) * rate)
+    if tokens >= 1:
+        return tokens - 1, 0.0
+    return tokens, (1 - tokens) / rate
+
+def settings_from_env() -> dict:
+    # Per-client rate limiting is off unless TODO_RATE_LIMIT is set: behind a
+    # proxy every user would share the proxy's bucket. Write shedding is on.
+    state_path = os.environ.get("TODO_RATE_LIMIT_STATE")
+    rate = os.environ.get("TODO_RATE_LIMIT")
+    burst = os.environ.get("TODO_RATE_BURST")
+    return {
+        "rate": float(rate) if rate else None,
+        "burst": float(burst) if burst else None,
+        "max_concurrent_writes": int(os.environ.get("TODO_MAX_CONCURRENT_WRITES", "8")),
+        "max_write_queue": int(os.environ.get("TODO_MAX_WRITE_QUEUE", "64")),
+        "write_timeout": float(os.environ.get("TODO_WRITE_TIMEOUT", "2.0")),
+        "store": FileBucketStore(state_path) if state_path else None,
+    }
+
+class AdmissionControl:
+    """ASGI middleware for rate limiting and load shedding.
+
+    With a rate set, every request spends a token from its client's bucket
+    (429 when empty); burst defaults to two seconds' worth. Mutating
+    requests also need one of a fixed number of write slots. A
+    request is shed with 503 up front when the queue is full or the expected
+    wait already exceeds its deadline, rather than queueing until it times
+    out. Clients may shorten the deadline with an X-Request-Timeout header
+    (seconds). Both rejections carry Retry-After.
+    """
+
+    def __init__(self, app, rate: Optional[float] = None, burst: Optional[float] = None,
+                 max_concurrent_writes: int = 8, max_write_queue: int = 64, write_timeout: float = 2.0,
+                 store=None):
+        self.app = app
+        self.rate = rate
+        self.burst = burst if burst is not None or rate is None else 2 * rate
+        self.max_concurrent_writes = max_concurrent_writes
+        self.max_write_queue = max_write_queue
+        self.write_timeout = write_timeout
+        self.store = store or MemoryBucketStore()
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._active = 0
+        self._waiting = 0
+        # Moving average of how long a write holds its slot, in seconds.
+        self._service_time = 0.01
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] == "OPTIONS":
+            return await self.app(scope, receive, send)
+
+        if self.rate is not None:
+            client = scope.get("client")
+            wait = self.store.take(client[0] if client else "unknown", self.rate, self.burst, time.time())
+            if wait > 0:
+                return await self._reject(send, 429, "Rate limit exceeded", wait)
+
+        if scope["method"] not in MUTATING_METHODS:
+            return await self.app(scope, receive, send)
+
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_concurrent_writes)
+        deadline = self._deadline(scope)
+        expected_wait = self._expected_wait()
+        if self._active >= self.max_concurrent_writes and (
+            self._waiting >= self.max_write_queue or expected_wait > deadline
+        ):
+            return await self._reject(send, 503, "Server busy", expected_wait)
+
+        if self._slots.locked():
+            self._waiting += 1
+            try:
+                await asyncio.wait_for(self._slots.acquire(), deadline)
+            except asyncio.TimeoutError:
+                return await self._reject(send, 503, "Server busy", self._expected_wait())
+            finally:
+                self._waiting -= 1
+        else:
+            # A free slot is taken without suspending, even with a zero deadline.
+            await self._slots.acquire()
+
+        self._active += 1
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self._active -= 1
+            self._slots.release()
+            self._service_time = 0.9 * self._service_time + 0.1 * (time.perf_counter() - start)
+
+    def _deadline(self, scope) -> float:
+        for name, value in scope["headers"]:
+            if name == b"x-request-timeout":
+                try:
+                    return min(self.write_timeout, max(0.0, float(value)))
+                except ValueError:
+                    break
+        return self.write_timeout
+
+    def _expected_wait(self) -> float:
+        return (self._waiting + 1) * self._service_time / self.max_concurrent_writes
+
+    async def _reject(self, send, status: int, detail: str, retry_after: float):
+        body = json.dumps({"detail": detail}).encode()
+        await send({
+            "type": "http.response.start",
+            "status": status,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                (b"retry-after", str(max(1, math.ceil(retry_after))).encode()),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
@@ -0,0 +1,52 @@
+from datetime import date, timedelta
+from typing import Iterator, Optional, Tuple
+from models import Task
+from pmap import PMap, PSet, PSortedList
+
+GROUPS = ("day", "week", "month")
+
+class DueDateIndex:
+    """Live task ids bucketed by due date, with undated tasks kept apart."""
+
+    def __init__(self):
+        self.tasks_by_date = PMap()
+        self.dates = PSortedList()
+        self.undated = PSet()
+
+    def on_change(self, old: Optional[Task], new: Optional[Task]):
+        if old is not None:
+            if old.due_date is None:
+                self.undated = self.undated.discard(old.id)
+            else:
+                task_ids = self.tasks_by_date.get(old.due_date).discard(old.id)
+                if task_ids:
+                    self.tasks_by_date = self.tasks_by_date.set(old.due_date, task_ids)
+                else:
+                    self.tasks_by_date = self.tasks_by_date.remove(old.due_date)
+                    self.dates = self.dates.remove(old.due_date)
+        if new is not None:
+            if new.due_date is None:
+                self.undated = self.undated.add(new.id)
+                return
+            task_ids = self.tasks_by_date.get(new.due_date)
+            if task_ids is None:
+                task_ids = PSet()
+                self.dates = self.dates.add(new.due_date)
+            self.tasks_by_date = self.tasks_by_date.set(new.due_date, task_ids.add(new.id))
+
+    def window(self, start: date, end: date) -> Iterator[Tuple[date, PSet]]:
+        # Dates from start to end inclusive that have tasks due. Bisecting the
+        # sorted dates costs what is inside the window, not the task count.
+        for day in self.dates.irange(start, end):
+            yield day, self.tasks_by_date.get(day)
+
+def bucket_bounds(day: date, group: str) -> Tuple[date, date]:
+    # First and last day of the bucket holding day; weeks start on Monday.
+    if group == "week":
+        start = day - timedelta(days=day.weekday())
+        return start, start + timedelta(days=6)
+    if group == "month":
+        start = day.replace(day=1)
+        next_month = (start + timedelta(days=32)).replace(day=1)
+        return start, next_month - timedelta(days=1)
+    return day, day
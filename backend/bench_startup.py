@@ -0,0 +1,60 @@
+"""Compare cold-start time of the JSON and snapshot storage formats.
+
+Each format is loaded in a fresh interpreter which starts the app, serves
+GET /tasks/{id} (time to first request) and then GET /tasks (full decode).
+The "empty" row is the same run without data, i.e. the import and app
+startup cost shared by every format.
+
+    python bench_startup.py --count 100000
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+from typing import List
+import generate
+import snapshot
+
+PROBE = """
+import sys, time
+start = time.perf_counter()
+from fastapi.testclient import TestClient
+import main
+with TestClient(main.app) as client:
+    response = client.get("/tasks/" + sys.argv[1])
+    first = time.perf_counter() - start
+    assert response.status_code in (200, 404), response.text
+    client.get("/tasks")
+    full = time.perf_counter() - start
+print(f"{first:.3f} {full:.3f}")
+"""
+
+def probe(path: str, task_id: str) -> List[str]:
+    env = dict(os.environ, TODO_DB_FILE=path, PYTHONPATH=os.path.dirname(os.path.abspath(__file__)))
+    result = subprocess.run(
+        [sys.executable, "-c", PROBE, task_id],
+        cwd=os.path.dirname(path), env=env, capture_output=True, text=True, check=True,
+    )
+    return result.stdout.split()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--count", type=int, default=100_000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        json_path = os.path.join(workdir, "tasks.json")
+        snap_path = os.path.join(workdir, "tasks.snap")
+        ids = generate.write_dataset(json_path, args.count)
+        snapshot.convert(json_path, snap_path)
+        task_id = ids[len(ids) // 2]
+
+        print(f"{args.count} tasks")
+        print(f"{'format':<10}{'file size':>12}{'first request':>16}{'full list':>12}")
+        first, full = probe(os.path.join(workdir, "empty.json"), task_id)
+        print(f"{'empty':<10}{0:>10.1f}MB{first:>15}s{full:>11}s")
+        for path in (json_path, snap_path):
+            first, full = probe(path, task_id)
+            size = os.path.getsize(path) / 1e6
+            print(f"{os.path.splitext(path)[1][1:]:<10}{size:>10.1f}MB{first:>15}s{full:>11}s")
@@ -0,0 +1,51 @@
+import asyncio
+from typing import Awaitable, Callable, Dict, Hashable
+
+class SingleFlight:
+    """Shares one in-flight computation between concurrent identical calls.
+
+    The first caller for a key starts the computation as a task of its own;
+    every caller with the same key, the first included, awaits that task
+    until it finishes. Nothing is cached once the computation completes.
+    """
+
+    def __init__(self):
+        self._in_flight: Dict[Hashable, asyncio.Task] = {}
+        self.hits = 0
+        self.misses = 0
+
+    async def do(self, key: Hashable, compute: Callable[[], Awaitable[bytes]]) -> bytes:
+        while True:
+            task = self._in_flight.get(key)
+            if task is not None:
+                self.hits += 1
+            else:
+                self.misses += 1
+                task = asyncio.ensure_future(compute())
+                self._in_flight[key] = task
+                task.add_done_callback(lambda done: self._finished(key, done))
+            try:
+                # Shielded so a cancelled caller stops waiting without
+                # cancelling the work the other callers share.
+                return await asyncio.shield(task)
+            except asyncio.CancelledError:
+                if task.cancelled() and not asyncio.current_task().cancelling():
+                    # The shared work was cancelled, not this caller: retry.
+                    continue
+                raise
+
+    def _finished(self, key: Hashable, task: asyncio.Task):
+        if self._in_flight.get(key) is task:
+            del self._in_flight[key]
+        if not task.cancelled():
+            # Mark it retrieved; callers still waiting re-raise it themselves.
+            task.exception()
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "in_flight": len(self._in_flight),
+            "hit_rate": self.hits / total if total else 0.0,
+        }
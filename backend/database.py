@@ -1,58 +1,489 @@
+import copy
+import fcntl
 import json
 import os
-from typing import List, Optional
-from models import Task, TaskCreate
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import date, datetime, timedelta, timezone
+from typing import Callable, Dict, List, NamedTuple, Optional
+from agenda import DueDateIndex
+from graph import TaskGraph
+from models import Agenda, AgendaBucket, Task, TaskCreate, TaskNode, View, ViewDefinition
+from profiling import phase
+from tags import TagIndex
+from versions import DictBase, SnapshotBase, Version
+from views import ViewIndex
+import agenda
+import history
+import snapshot
+import views
 import uuid
 
-DB_FILE = "tasks.json"
+# A path ending in .snap selects the binary snapshot format.
+DB_FILE = os.environ.get("TODO_DB_FILE", "tasks.json")
 
-def get_tasks() -> List[Task]:
+# Deleted tasks stay in the trash this long before the purger removes them.
+TRASH_RETENTION = timedelta(days=30)
+
+# Called with (old, new) after every mutation; old is None for a created task,
+# new is None for a deleted one.
+Listener = Callable[[Optional[Task], Optional[Task]], None]
+_listeners: List[Listener] = []
+
+class Indexes(NamedTuple):
+    """Indexes owned by the storage layer, published with each version.
+
+    They are built on first use. After that every write derives the next
+    version's indexes from a shallow copy of the previous ones. Every index
+    keeps its state in persistent structures (pmap.py) or in dicts that
+    on_change, define and remove replace rather than mutate, so that shallow
+    copy is a snapshot: older versions keep indexes that match their tasks,
+    and readers use them without the write lock.
+    """
+
+    graph: TaskGraph
+    tags: TagIndex
+    views: ViewIndex
+    due: DueDateIndex
+
+# The latest published version of all tasks, including soft-deleted ones.
+# Loaded from DB_FILE plus the journal on first use. Writers build the next
+# version under _write_lock and publish it with a single assignment; readers
+# never take the lock for task data.
+_current: Optional[Version] = None
+_write_lock = threading.RLock()
+
+# Identifies the files _current was loaded from or last written to. A writer
+# that finds them changed reloads first, so it never overwrites changes made
+# by another process sharing DB_FILE.
+_disk_state: Optional[tuple] = None
+
+# Version pinned for the duration of a request, see pin().
+_pinned: ContextVar[Optional[Version]] = ContextVar("pinned_version", default=None)
+
+def subscribe(listener: Listener, replay: bool = True):
+    with _write_lock:
+        _listeners.append(listener)
+        if replay:
+            # Replay the current tasks so the listener can build its initial state.
+            for task in get_tasks():
+                listener(None, task)
+
+def unsubscribe(listener: Listener):
+    with _write_lock:
+        if listener in _listeners:
+            _listeners.remove(listener)
+
+def _notify(old: Optional[Task], new: Optional[Task]):
+    for listener in _listeners:
+        listener(old, new)
+
+def journal_file() -> str:
+    return os.path.splitext(DB_FILE)[0] + ".journal"
+
+def lock_file() -> str:
+    return os.path.splitext(DB_FILE)[0] + ".lock"
+
+def history_file() -> str:
+    return os.path.splitext(DB_FILE)[0] + ".history"
+
+def views_file() -> str:
+    return os.path.splitext(DB_FILE)[0] + ".views.json"
+
+def reminders_file() -> str:
+    return os.path.splitext(DB_FILE)[0] + ".reminders.json"
+
+def is_snapshot() -> bool:
+    return DB_FILE.endswith(".snap")
+
+def reset():
+    # Drop the in-memory state so the next access reloads from disk.
+    global _current
+    with _write_lock:
+        _current = None
+        history.reset()
+
+def _read_tasks_file() -> List[Task]:
     if not os.path.exists(DB_FILE):
         return []
     with open(DB_FILE, "r") as f:
         try:
-            data = json.load(f)
-            return [Task(**t) for t in data]
+            with phase("parse"):
+                data = json.load(f)
         except json.JSONDecodeError:
             return []
+    with phase("validate"):
+        return [Task(**t) for t in data]
+
+def _read_base():
+    if not is_snapshot():
+        return DictBase(_read_tasks_file())
+    if not os.path.exists(DB_FILE):
+        return DictBase()
+    return SnapshotBase(snapshot.Snapshot(DB_FILE))
+
+def _replay_journal(version: Version) -> Version:
+    if not os.path.exists(journal_file()):
+        return version
+    with open(journal_file(), "r") as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                # A torn line from an interrupted append; later appends start
+                # on a fresh line, see _append_journal().
+                continue
+            if entry["op"] == "put":
+                with phase("validate"):
+                    task = Task(**entry["task"])
+                version = version.put(task)
+                continue
+            task = version.get(entry["id"])
+            if task is None:
+                continue
+            deleted_at = datetime.fromisoformat(entry["at"]) if entry["op"] == "delete" else None
+            version = version.put(task.model_copy(update={"deleted_at": deleted_at}))
+    return version
+
+def _append_journal(entry: dict):
+    with phase("journal"), open(journal_file(), "a+b") as f:
+        line = (json.dumps(entry) + "\n").encode()
+        end = f.seek(0, os.SEEK_END)
+        if end:
+            f.seek(end - 1)
+            if f.read(1) != b"\n":
+                line = b"\n" + line
+        f.write(line)
+
+def _stat_files() -> tuple:
+    state = []
+    for path in (DB_FILE, journal_file(), views_file()):
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            state.append(None)
+        else:
+            state.append((st.st_ino, st.st_size, st.st_mtime_ns))
+    return tuple(state)
+
+def _load() -> Version:
+    global _current, _disk_state
+    if _current is None:
+        with _write_lock:
+            if _current is None:
+                # Taken before reading, so a write racing the load shows up as a change.
+                _disk_state = _stat_files()
+                _current = _replay_journal(Version(_read_base()))
+    return _current
+
+def _reload_if_changed():
+    # Caller holds the write lock and the file lock. Other processes' writes
+    # show up as a change to the files; listeners are not told about them,
+    # the indexes are rebuilt.
+    global _current, _disk_state
+    state = _stat_files()
+    if _current is not None and state != _disk_state:
+        _disk_state = state
+        _current = _replay_journal(Version(_read_base(), _current.number + 1))
+        history.reset()
+
+@contextmanager
+def _file_lock(operation: int):
+    fd = os.open(lock_file(), os.O_RDWR | os.O_CREAT, 0o600)
+    try:
+        fcntl.flock(fd, operation)
+        yield
+    finally:
+        os.close(fd)
+
+def _refresh() -> Version:
+    # The latest version, reloaded first if another process sharing DB_FILE
+    # wrote since we last looked. Nothing changed costs three stat calls.
+    version = _load()
+    if _stat_files() == _disk_state:
+        return version
+    with _write_lock, _file_lock(fcntl.LOCK_SH):
+        # Shared, so a writer's base file and journal are read as one.
+        _reload_if_changed()
+        return _current
+
+@contextmanager
+def _writing():
+    # Serializes writers across threads and across processes sharing DB_FILE.
+    global _disk_state
+    with _write_lock, _file_lock(fcntl.LOCK_EX):
+        _reload_if_changed()
+        try:
+            yield
+        finally:
+            _disk_state = _stat_files()
+
+def _publish(version: Version, old: Optional[Task] = None, new: Optional[Task] = None):
+    # old -> new is the change from the previous version, as passed to
+    # listeners; the new version gets the previous indexes with it applied.
+    global _current
+    previous = _current.indexes if _current is not None else None
+    if version.indexes is None and previous is not None:
+        if old is None and new is None:
+            version.indexes = previous
+        else:
+            indexes = Indexes(*(copy.copy(index) for index in previous))
+            for index in indexes:
+                index.on_change(old, new)
+            version.indexes = indexes
+    _current = version
+
+def current_version() -> Version:
+    # The version pinned for this request, or the latest one outside a request.
+    version = _pinned.get()
+    return version if version is not None else _refresh()
+
+def latest_version_number() -> int:
+    # Ignores any pinned version, e.g. to report what a write just published.
+    return _refresh().number
+
+@contextmanager
+def pin():
+    # Every read inside the block sees the same version, however many writes
+    # are published in the meantime.
+    token = _pinned.set(_refresh())
+    try:
+        yield
+    finally:
+        _pinned.reset(token)
+
+def _build_indexes(version: Version) -> Indexes:
+    indexes = Indexes(TaskGraph(), TagIndex(), ViewIndex(views.load_definitions()), DueDateIndex())
+    for task in version.values():
+        if task.deleted_at is None:
+            for index in indexes:
+                index.on_change(None, task)
+    return indexes
+
+def _ensure_indexes() -> Indexes:
+    # Indexes of the latest version. They are attached in place: they match
+    # its tasks exactly, so readers already holding it may pick them up.
+    with _write_lock:
+        version = _load()
+        if version.indexes is None:
+            version.indexes = _build_indexes(version)
+        return version.indexes
+
+def _read_indexes() -> Indexes:
+    # Indexes of the pinned version, read without the write lock, so ids
+    # they return resolve against the same tasks. Only the first read after
+    # a load waits for the build.
+    version = current_version()
+    if version.indexes is None:
+        _ensure_indexes()
+        if version.indexes is None:
+            # Pinned before a reload from disk replaced it.
+            return _build_indexes(version)
+    return version.indexes
+
+def _validate_links(task_id: str, parent_id: Optional[str], depends_on: List[str],
+                    require_existing: bool = True, previous: Optional[Task] = None):
+    if parent_id is None and not depends_on:
+        return
+    _ensure_indexes().graph.validate(task_id, parent_id, depends_on, require_existing, previous)
+
+def _flush():
+    if is_snapshot():
+        with phase("save"):
+            snapshot.write(DB_FILE, _load().values())
+    else:
+        save_tasks(list(_load().values()))
+    # The full file now includes every journaled change.
+    if os.path.exists(journal_file()):
+        os.remove(journal_file())
+
+def _save(task: Task):
+    # JSON storage is rewritten in full; a snapshot keeps the change in the
+    # journal until the next compaction.
+    if is_snapshot():
+        _append_journal({"op": "put", "task": task.model_dump(mode="json")})
+    else:
+        _flush()
+
+def get_tasks() -> List[Task]:
+    return [t for t in current_version().values() if t.deleted_at is None]
+
+def task_ids() -> List[str]:
+    return list(current_version().ids())
+
+def get_trash() -> List[Task]:
+    trash = [t for t in current_version().values() if t.deleted_at is not None]
+    return sorted(trash, key=lambda t: t.deleted_at, reverse=True)
 
 def save_tasks(tasks: List[Task]):
-    with open(DB_FILE, "w") as f:
-        # Convert date objects to isoformat string automatically via pydantic's model_dump/dict inside FastAPI usually, 
-        # but here we are manually saving.
-        # Pydantic v2 model_dump with mode='json' handles dates.
-        json_data = [t.model_dump(mode='json') for t in tasks]
-        json.dump(json_data, f, indent=4)
-
-def add_task(task_create: TaskCreate) -> Task:
-    tasks = get_tasks()
+    # Written to a temporary file and renamed over DB_FILE, so a crash
+    # mid-write leaves the previous file intact.
+    tmp_path = DB_FILE + ".tmp"
+    with phase("save"):
+        with open(tmp_path, "w") as f:
+            # Convert date objects to isoformat string automatically via pydantic's model_dump/dict inside FastAPI usually,
+            # but here we are manually saving.
+            # Pydantic v2 model_dump with mode='json' handles dates.
+            json_data = [t.model_dump(mode='json') for t in tasks]
+            json.dump(json_data, f, indent=4)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, DB_FILE)
+
+def add_task(task_create: TaskCreate, actor: Optional[str] = None) -> Task:
     new_task = Task(id=str(uuid.uuid4()), **task_create.model_dump())
-    tasks.append(new_task)
-    save_tasks(tasks)
+    with _writing():
+        _validate_links(new_task.id, new_task.parent_id, new_task.depends_on)
+        _publish(_load().put(new_task), None, new_task)
+        _save(new_task)
+        history.record("create", None, new_task, actor)
+        _notify(None, new_task)
     return new_task
 
-def update_task(task_id: str, task_update: TaskCreate) -> Optional[Task]:
-    tasks = get_tasks()
-    for i, task in enumerate(tasks):
-        if task.id == task_id:
-            updated_task = Task(id=task_id, **task_update.model_dump())
-            tasks[i] = updated_task
-            save_tasks(tasks)
-            return updated_task
-    return None
-
-def delete_task(task_id: str) -> bool:
-    tasks = get_tasks()
-    initial_len = len(tasks)
-    tasks = [t for t in tasks if t.id != task_id]
-    if len(tasks) < initial_len:
-        save_tasks(tasks)
-        return True
-    return False
+def update_task(task_id: str, task_update: TaskCreate, actor: Optional[str] = None) -> Optional[Task]:
+    with _writing():
+        task = _load().get(task_id)
+        if task is None or task.deleted_at is not None:
+            return None
+        updated_task = Task(id=task_id, **task_update.model_dump())
+        # Only new links must point at live tasks; the client sends the
+        # unchanged ones back on every edit.
+        _validate_links(task_id, updated_task.parent_id, updated_task.depends_on, previous=task)
+        _publish(_load().put(updated_task), task, updated_task)
+        _save(updated_task)
+        history.record("update", task, updated_task, actor)
+        _notify(task, updated_task)
+    return updated_task
+
+def delete_task(task_id: str, actor: Optional[str] = None) -> bool:
+    # Soft delete: mark the task and append a journal entry instead of
+    # rewriting the whole file. purge_trash() folds it back in later.
+    with _writing():
+        task = _load().get(task_id)
+        if task is None or task.deleted_at is not None:
+            return False
+        deleted_task = task.model_copy(update={"deleted_at": datetime.now(timezone.utc)})
+        _publish(_load().put(deleted_task), task, None)
+        _append_journal({"op": "delete", "id": task_id, "at": deleted_task.deleted_at.isoformat()})
+        history.record("delete", task, deleted_task, actor)
+        _notify(task, None)
+    return True
+
+def restore_task(task_id: str, actor: Optional[str] = None) -> Optional[Task]:
+    with _writing():
+        task = _load().get(task_id)
+        if task is None or task.deleted_at is None:
+            return None
+        # Links to tasks that are gone are kept, but the restore must not close a cycle.
+        _validate_links(task_id, task.parent_id, task.depends_on, require_existing=False)
+        restored_task = task.model_copy(update={"deleted_at": None})
+        _publish(_load().put(restored_task), None, restored_task)
+        _append_journal({"op": "restore", "id": task_id})
+        history.record("restore", task, restored_task, actor)
+        _notify(None, restored_task)
+    return restored_task
+
+def purge_trash(now: Optional[datetime] = None) -> int:
+    # Drop expired tombstones and compact the journal into DB_FILE in one write.
+    cutoff = (now or datetime.now(timezone.utc)) - TRASH_RETENTION
+    with _writing():
+        version = _load()
+        expired = [t.id for t in version.values() if t.deleted_at is not None and t.deleted_at <= cutoff]
+        if not expired and not os.path.exists(journal_file()):
+            return 0
+        for task_id in expired:
+            version = version.remove(task_id)
+        _publish(version)
+        _flush()
+        # Start a fresh base so the overlay of changes does not keep growing.
+        base = SnapshotBase(snapshot.Snapshot(DB_FILE)) if is_snapshot() else DictBase(version.values())
+        _publish(Version(base, version.number + 1))
+    return len(expired)
 
 def get_task(task_id: str) -> Optional[Task]:
-    tasks = get_tasks()
-    for task in tasks:
-        if task.id == task_id:
-            return task
-    return None
+    task = current_version().get(task_id)
+    if task is None or task.deleted_at is not None:
+        return None
+    return task
+
+def get_subtree(task_id: str) -> Optional[TaskNode]:
+    graph = _read_indexes().graph
+    if task_id not in graph.nodes:
+        return None
+
+    def build(node_id: str) -> TaskNode:
+        children = [build(child_id) for child_id in graph.child_ids(node_id)]
+        return TaskNode(task=graph.nodes.get(node_id), children=children, **graph.rollup(node_id))
+
+    return build(task_id)
+
+def _by_due_date(task_ids) -> List[Task]:
+    tasks = (get_task(task_id) for task_id in task_ids)
+    return sorted((t for t in tasks if t is not None), key=lambda t: (t.due_date is None, t.due_date))
+
+def get_ready_tasks() -> List[Task]:
+    return _by_due_date(_read_indexes().graph.ready)
+
+def get_tasks_by_tags(tags: List[str], match_all: bool = True) -> List[Task]:
+    return _by_due_date(_read_indexes().tags.query(tags, match_all))
+
+def get_tag_counts() -> Dict[str, int]:
+    return _read_indexes().tags.counts()
+
+def get_agenda(start: date, end: date, group: str = "day", include_undated: bool = False) -> Agenda:
+    due_index = _read_indexes().due
+    buckets: List[AgendaBucket] = []
+    for day, task_ids in due_index.window(start, end):
+        tasks = sorted(map(get_task, task_ids), key=lambda t: (t.title, t.id))
+        bucket_start, bucket_end = agenda.bucket_bounds(day, group)
+        if not buckets or buckets[-1].start != bucket_start:
+            buckets.append(AgendaBucket(start=bucket_start, end=bucket_end, tasks=[]))
+        buckets[-1].tasks.extend(tasks)
+    undated = due_index.undated if include_undated else ()
+    undated_tasks = sorted(map(get_task, undated), key=lambda t: (t.title, t.id))
+    return Agenda(start=start, end=end, group=group, buckets=buckets, undated=undated_tasks)
+
+def get_views() -> List[View]:
+    view_index = _read_indexes().views
+    today = date.today()
+    return [view_index.view(name, today) for name in sorted(view_index.definitions)]
+
+def has_view(name: str) -> bool:
+    return name in _read_indexes().views.definitions
+
+def get_view(name: str) -> Optional[View]:
+    view_index = _read_indexes().views
+    if name not in view_index.definitions:
+        return None
+    return view_index.view(name, date.today())
+
+def get_view_tasks(name: str, offset: int = 0, limit: Optional[int] = None) -> Optional[List[Task]]:
+    # Ids come pre-sorted from the materialized view; only the requested page
+    # is resolved against the pinned version.
+    view_index = _read_indexes().views
+    if name not in view_index.definitions:
+        return None
+    return [get_task(task_id) for task_id in view_index.ids(name, date.today(), offset, limit)]
+
+def _publish_views(version: Version, view_index: ViewIndex):
+    views.save_definitions(view_index.definitions)
+    _publish(version.with_indexes(version.indexes._replace(views=view_index)))
+
+def save_view(name: str, definition: ViewDefinition) -> View:
+    with _writing():
+        version = _load()
+        view_index = copy.copy(_ensure_indexes().views)
+        view_index.define(name, definition, (t for t in version.values() if t.deleted_at is None))
+        _publish_views(version, view_index)
+        return view_index.view(name, date.today())
+
+def delete_view(name: str) -> bool:
+    with _writing():
+        version = _load()
+        view_index = copy.copy(_ensure_indexes().views)
+        if name not in view_index.definitions:
+            return False
+        view_index.remove(name)
+        _publish_views(version, view_index)
+    return True
@@ -0,0 +1,140 @@
+"""Deterministic synthetic task datasets for scale tests and benchmarks.
+
+The same seed and anchor date always produce the same tasks. The format is
+picked from the target's extension, as for TODO_DB_FILE:
+
+    python generate.py tasks.json --count 100000 --seed 7
+    python generate.py tasks.snap --count 1000000 --completed 0.5
+"""
+import argparse
+import json
+import random
+import uuid
+from dataclasses import dataclass
+from datetime import date, timedelta
+from typing import Iterable, Iterator, List, Optional, Tuple
+from models import Category, Priority, Task
+import snapshot
+
+WORDS = (
+    "review plan write call email fix update prepare draft read send book clean "
+    "report meeting invoice budget project design test deploy research notes "
+    "client team weekly quarterly release backlog docs slides study exam groceries"
+).split()
+
+# Generated values are valid by construction, so validation is skipped.
+FIELDS_SET = set(Task.model_fields)
+
+@dataclass
+class Distribution:
+    priority_weights: Tuple[float, ...] = (1, 2, 1)          # Low, Medium, High
+    category_weights: Tuple[float, ...] = (1, 1, 1, 1)       # None, Work, Personal, Study
+    completed: float = 0.3
+    due_ratio: float = 0.7
+    due_days: Tuple[int, int] = (-30, 90)                     # relative to the anchor date
+    description_length: Tuple[int, int] = (0, 200)            # characters, 0 means none
+    tags_per_task: Tuple[int, int] = (0, 3)
+    tag_pool: int = 50
+
+def generate_tasks(count: int, seed: int = 0, anchor: Optional[date] = None,
+                   distribution: Optional[Distribution] = None) -> Iterator[Task]:
+    dist = distribution or Distribution()
+    anchor = anchor or date.today()
+    rng = random.Random(seed)
+    priorities = list(Priority)
+    categories = [None, *Category]
+    tags = [f"tag{i}" for i in range(dist.tag_pool)]
+
+    for i in range(count):
+        length = rng.randint(*dist.description_length)
+        description = " ".join(rng.choices(WORDS, k=length // 6 + 1))[:length] if length else None
+        due_date = None
+        if rng.random() < dist.due_ratio:
+            due_date = anchor + timedelta(days=rng.randint(*dist.due_days))
+        yield Task.model_construct(
+            FIELDS_SET,
+            id=str(uuid.UUID(int=rng.getrandbits(128), version=4)),
+            title=f"{rng.choice(WORDS).capitalize()} {rng.choice(WORDS)} #{i}",
+            description=description,
+            priority=rng.choices(priorities, dist.priority_weights)[0],
+            category=rng.choices(categories, dist.category_weights)[0],
+            due_date=due_date,
+            completed=rng.random() < dist.completed,
+            parent_id=None,
+            depends_on=[],
+            tags=rng.sample(tags, min(len(tags), rng.randint(*dist.tags_per_task))),
+            deleted_at=None,
+        )
+
+def write_tasks(path: str, tasks: Iterable[Task]) -> int:
+    if path.endswith(".snap"):
+        tasks = list(tasks)
+        snapshot.write(path, tasks)
+        return len(tasks)
+    # Streamed so a million tasks never sit in memory as one JSON document.
+    count = 0
+    with open(path, "w") as f:
+        f.write("[")
+        for task in tasks:
+            f.write(",\n" if count else "\n")
+            f.write(json.dumps(task.model_dump(mode="json")))
+            count += 1
+        f.write("\n]\n")
+    return count
+
+def write_dataset(path: str, count: int, seed: int = 0, anchor: Optional[date] = None,
+                  distribution: Optional[Distribution] = None) -> List[str]:
+    # Returns the generated ids so tests can address individual tasks.
+    ids: List[str] = []
+
+    def tracked():
+        for task in generate_tasks(count, seed, anchor, distribution):
+            ids.append(task.id)
+            yield task
+
+    write_tasks(path, tracked())
+    return ids
+
+def _floats(value: str) -> Tuple[float, ...]:
+    return tuple(float(v) for v in value.split(","))
+
+def _range(value: str) -> Tuple[int, int]:
+    low, high = value.split(":")
+    return int(low), int(high)
+
+if __name__ == "__main__":
+    defaults = Distribution()
+    parser = argparse.ArgumentParser(description="Generate a deterministic synthetic task dataset.")
+    parser.add_argument("target", help="output path; .snap writes a snapshot, anything else JSON")
+    parser.add_argument("--count", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--anchor", type=date.fromisoformat, default=None,
+                        help="date due dates are spread around (default: today)")
+    parser.add_argument("--priority-weights", type=_floats, default=defaults.priority_weights,
+                        help="Low,Medium,High weights")
+    parser.add_argument("--category-weights", type=_floats, default=defaults.category_weights,
+                        help="None,Work,Personal,Study weights")
+    parser.add_argument("--completed", type=float, default=defaults.completed,
+                        help="fraction of completed tasks")
+    parser.add_argument("--due-ratio", type=float, default=defaults.due_ratio,
+                        help="fraction of tasks with a due date")
+    parser.add_argument("--due-days", type=_range, default=defaults.due_days,
+                        help="due date spread in days around the anchor, e.g. -30:90")
+    parser.add_argument("--description-length", type=_range, default=defaults.description_length,
+                        help="description length range in characters, e.g. 0:200")
+    parser.add_argument("--tags-per-task", type=_range, default=defaults.tags_per_task)
+    parser.add_argument("--tag-pool", type=int, default=defaults.tag_pool)
+    args = parser.parse_args()
+
+    distribution = Distribution(
+        priority_weights=args.priority_weights,
+        category_weights=args.category_weights,
+        completed=args.completed,
+        due_ratio=args.due_ratio,
+        due_days=args.due_days,
+        description_length=args.description_length,
+        tags_per_task=args.tags_per_task,
+        tag_pool=args.tag_pool,
+    )
+    count = write_tasks(args.target, generate_tasks(args.count, args.seed, args.anchor, distribution))
+    print(f"Wrote {count} tasks to {args.target}")
@@ -0,0 +1,166 @@
+from typing import Iterable, List, Optional
+from models import Task
+from pmap import PMap, PSet
+
+class TaskGraph:
+    """Parent/child and dependency indexes over the live tasks."""
+
+    def __init__(self):
+        # Edges are kept as declared even when the other end is deleted, so
+        # they reconnect when it comes back. Subtree sizes, completion counts
+        # and open dependency counts are updated along the way on every
+        # change, which keeps the ready set current without recomputation.
+        self.nodes = PMap()
+        self.children = PMap()
+        self.dependents = PMap()
+        self.ready = PSet()
+        self._size = PMap()
+        self._done = PMap()
+        self._unmet = PMap()
+
+    def on_change(self, old: Optional[Task], new: Optional[Task]):
+        if old is not None:
+            self._remove(old.id)
+        if new is not None:
+            self._add(new)
+
+    def rollup(self, task_id: str) -> dict:
+        # Counts cover the subtasks below task_id, not the task itself.
+        return {
+            "subtasks_total": self._size.get(task_id) - 1,
+            "subtasks_completed": self._done.get(task_id) - int(self.nodes.get(task_id).completed),
+        }
+
+    def child_ids(self, task_id: str) -> List[str]:
+        return [c for c in self.children.get(task_id, ()) if c in self.nodes]
+
+    def validate(self, task_id: str, parent_id: Optional[str], depends_on: Iterable[str],
+                 require_existing: bool = True, previous: Optional[Task] = None):
+        # Links previous already had may point at tasks deleted or purged
+        # since, so they are only checked for cycles.
+        kept_parent = previous.parent_id if previous is not None else None
+        kept_deps = previous.depends_on if previous is not None else ()
+        if parent_id is not None:
+            if parent_id == task_id:
+                raise ValueError("A task cannot be its own parent")
+            if parent_id not in self.nodes:
+                if require_existing and parent_id != kept_parent:
+                    raise ValueError(f"Parent task {parent_id} not found")
+            elif self._has_ancestor(parent_id, task_id):
+                raise ValueError(f"Parent task {parent_id} would create a cycle")
+        for dep_id in depends_on:
+            if dep_id == task_id:
+                raise ValueError("A task cannot depend on itself")
+            if dep_id not in self.nodes:
+                if require_existing and dep_id not in kept_deps:
+                    raise ValueError(f"Dependency {dep_id} not found")
+            elif self._reaches(dep_id, task_id):
+                raise ValueError(f"Dependency {dep_id} would create a cycle")
+
+    def _ancestors(self, task_id: str) -> Iterable[str]:
+        # Guarded so a parent cycle already on disk cannot loop forever.
+        seen = {task_id}
+        parent_id = self.nodes.get(task_id).parent_id
+        while parent_id in self.nodes and parent_id not in seen:
+            seen.add(parent_id)
+            yield parent_id
+            parent_id = self.nodes.get(parent_id).parent_id
+
+    def _has_ancestor(self, start: str, target: str) -> bool:
+        # Follows declared parents from start, itself included. target need not
+        # be live: a task being restored still closes a cycle through its
+        # children's declared parent_id.
+        seen = set()
+        task_id = start
+        while task_id is not None and task_id not in seen:
+            if task_id == target:
+                return True
+            seen.add(task_id)
+            node = self.nodes.get(task_id)
+            if node is None:
+                return False
+            task_id = node.parent_id
+        return False
+
+    def _reaches(self, start: str, target: str) -> bool:
+        stack, seen = [start], {start}
+        while stack:
+            task_id = stack.pop()
+            if task_id == target:
+                return True
+            for dep_id in self.nodes.get(task_id).depends_on:
+                # The target may be absent from nodes while it is being restored.
+                if dep_id == target:
+                    return True
+                if dep_id in self.nodes and dep_id not in seen:
+                    seen.add(dep_id)
+                    stack.append(dep_id)
+        return False
+
+    def _add(self, task: Task):
+        task_id = task.id
+        self.nodes = self.nodes.set(task_id, task)
+        if task.parent_id is not None:
+            self.children = self._add_edge(self.children, task.parent_id, task_id)
+
+        children = self.child_ids(task_id)
+        size = 1 + sum(self._size.get(c) for c in children)
+        done = int(task.completed) + sum(self._done.get(c) for c in children)
+        self._size = self._size.set(task_id, size)
+        self._done = self._done.set(task_id, done)
+        for ancestor_id in self._ancestors(task_id):
+            self._size = self._size.set(ancestor_id, self._size.get(ancestor_id) + size)
+            self._done = self._done.set(ancestor_id, self._done.get(ancestor_id) + done)
+
+        for dep_id in task.depends_on:
+            self.dependents = self._add_edge(self.dependents, dep_id, task_id)
+        unmet = sum(1 for d in task.depends_on if d in self.nodes and not self.nodes.get(d).completed)
+        self._unmet = self._unmet.set(task_id, unmet)
+        self._update_ready(task_id)
+        if not task.completed:
+            self._shift_dependents(task_id, 1)
+
+    def _remove(self, task_id: str):
+        task = self.nodes.get(task_id)
+        if task is None:
+            return
+        size, done = self._size.get(task_id), self._done.get(task_id)
+        for ancestor_id in self._ancestors(task_id):
+            self._size = self._size.set(ancestor_id, self._size.get(ancestor_id) - size)
+            self._done = self._done.set(ancestor_id, self._done.get(ancestor_id) - done)
+        if not task.completed:
+            self._shift_dependents(task_id, -1)
+
+        self.nodes = self.nodes.remove(task_id)
+        self._size = self._size.remove(task_id)
+        self._done = self._done.remove(task_id)
+        self._unmet = self._unmet.remove(task_id)
+        self.ready = self.ready.discard(task_id)
+        if task.parent_id is not None:
+            self.children = self._discard_edge(self.children, task.parent_id, task_id)
+        for dep_id in task.depends_on:
+            self.dependents = self._discard_edge(self.dependents, dep_id, task_id)
+
+    def _shift_dependents(self, task_id: str, delta: int):
+        for dependent_id in self.dependents.get(task_id, ()):
+            if dependent_id in self.nodes:
+                self._unmet = self._unmet.set(dependent_id, self._unmet.get(dependent_id) + delta)
+                self._update_ready(dependent_id)
+
+    def _update_ready(self, task_id: str):
+        if self._unmet.get(task_id) == 0 and not self.nodes.get(task_id).completed:
+            self.ready = self.ready.add(task_id)
+        else:
+            self.ready = self.ready.discard(task_id)
+
+    @staticmethod
+    def _add_edge(edges: PMap, key: str, task_id: str) -> PMap:
+        return edges.set(key, edges.get(key, PSet()).add(task_id))
+
+    @staticmethod
+    def _discard_edge(edges: PMap, key: str, task_id: str) -> PMap:
+        targets = edges.get(key)
+        if targets is None:
+            return edges
+        targets = targets.discard(task_id)
+        return edges.set(key, targets) if targets else edges.remove(key)
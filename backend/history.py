@@ -0,0 +1,101 @@
+import json
+import os
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+from models import Task
+import database
+
+# Byte offsets of each task's revision records in database.history_file().
+# Built on the first history access so the normal task paths never read the
+# file.
+_offsets: Optional[Dict[str, List[int]]] = None
+
+def reset():
+    global _offsets
+    _offsets = None
+
+def _snapshot(task: Optional[Task]) -> Dict[str, Any]:
+    if task is None:
+        return {}
+    return task.model_dump(mode="json", exclude={"id"})
+
+def _index() -> Dict[str, List[int]]:
+    global _offsets
+    if _offsets is None:
+        offsets: Dict[str, List[int]] = {}
+        if os.path.exists(database.history_file()):
+            with open(database.history_file(), "rb") as f:
+                offset = 0
+                for line in f:
+                    start, offset = offset, offset + len(line)
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        # A torn line from an interrupted append; later
+                        # appends start on a fresh line, see _append().
+                        continue
+                    offsets.setdefault(entry["task_id"], []).append(start)
+        _offsets = offsets
+    return _offsets
+
+def _append(entry: dict):
+    with open(database.history_file(), "a+b") as f:
+        line = (json.dumps(entry) + "\n").encode()
+        offset = f.seek(0, os.SEEK_END)
+        if offset:
+            f.seek(offset - 1)
+            if f.read(1) != b"\n":
+                line = b"\n" + line
+                offset += 1
+        f.write(line)
+    _index().setdefault(entry["task_id"], []).append(offset)
+
+def record(op: str, old: Optional[Task], new: Task, actor: Optional[str] = None):
+    # Only the fields that changed are stored; earlier values are recovered by
+    # replaying the task's revisions in order.
+    offsets = _index().get(new.id, [])
+    if old is not None and not offsets:
+        # First change to a task created before history was kept: store a baseline.
+        _append({"task_id": new.id, "rev": 0, "at": None, "actor": None, "op": "baseline", "changes": _snapshot(old)})
+        offsets = _index()[new.id]
+    before, after = _snapshot(old), _snapshot(new)
+    changes = {field: value for field, value in after.items() if before.get(field) != value}
+    if not changes:
+        return
+    _append({
+        "task_id": new.id,
+        "rev": len(offsets),
+        "at": datetime.now(timezone.utc).isoformat(),
+        "actor": actor,
+        "op": op,
+        "changes": changes,
+    })
+
+def _entries(task_id: str) -> List[dict]:
+    offsets = _index().get(task_id, [])
+    if not offsets:
+        return []
+    entries = []
+    with open(database.history_file(), "rb") as f:
+        for offset in offsets:
+            f.seek(offset)
+            entries.append(json.loads(f.readline()))
+    return entries
+
+def revisions(task_id: str) -> List[dict]:
+    state: Dict[str, Any] = {}
+    result = []
+    for entry in _entries(task_id):
+        changes = {field: {"old": state.get(field), "new": value} for field, value in entry["changes"].items()}
+        state.update(entry["changes"])
+        result.append({**entry, "changes": changes})
+    return result
+
+def reconstruct(task_id: str, rev: int) -> Optional[Task]:
+    entries = _entries(task_id)
+    if rev < 0 or rev >= len(entries):
+        return None
+    state: Dict[str, Any] = {}
+    for entry in entries[:rev + 1]:
+        state.update(entry["changes"])
+    return Task(id=task_id, **state)
@@ -1,42 +1,257 @@
-from fastapi import FastAPI, HTTPException
+import asyncio
+import logging
+import os
+from contextlib import asynccontextmanager, suppress
+from datetime import date, timedelta
+from fastapi import Depends, FastAPI, Header, HTTPException, Query, Request, Response
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
-from typing import List
-from models import Task, TaskCreate
+from pydantic import TypeAdapter
+from typing import Callable, Dict, List, Literal, Optional
+from models import Agenda, Revision, Task, TaskCreate, TaskNode, View, ViewDefinition
+import admission
+import coalesce
 import database
+import history
+import profiling
+import reminders
 
-app = FastAPI(title="Personal To-Do Manager API")
+logger = logging.getLogger("todo.main")
+
+scheduler = reminders.OverdueScheduler(reminders.notifier_from_env())
+
+PURGE_INTERVAL_SECONDS = float(os.environ.get("TODO_PURGE_INTERVAL", "3600"))
+
+# Tasks handed to the scheduler between yields to the event loop at startup.
+PRIME_BATCH_SIZE = 1000
+
+async def purge_trash_periodically():
+    while True:
+        await asyncio.sleep(PURGE_INTERVAL_SECONDS)
+        # Off the event loop: a purge rewrites DB_FILE and waits on the write lock.
+        try:
+            await run_in_threadpool(database.purge_trash)
+        except Exception:
+            # Keep purging on later ticks rather than ending the loop.
+            logger.exception("Purging the trash failed")
+
+async def run_scheduler():
+    # Prime in batches so loading a large dataset does not hold up the first
+    # requests. Live changes are delivered from the start; seed() treats a
+    # task it already knows as an update and doesn't renotify overdue ones an
+    # earlier run already checked.
+    scheduler.restore(database.reminders_file())
+    database.subscribe(scheduler.on_change, replay=False)
+    for i, task_id in enumerate(database.task_ids(), 1):
+        task = database.get_task(task_id)
+        if task is not None:
+            scheduler.seed(task)
+        if i % PRIME_BATCH_SIZE == 0:
+            await asyncio.sleep(0)
+    await scheduler.run()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    workers = [
+        asyncio.create_task(run_scheduler()),
+        asyncio.create_task(purge_trash_periodically()),
+    ]
+    yield
+    for worker in workers:
+        worker.cancel()
+    for worker in workers:
+        with suppress(asyncio.CancelledError):
+            await worker
+    database.unsubscribe(scheduler.on_change)
+
+app = FastAPI(title="Personal To-Do Manager API", lifespan=lifespan)
+if profiling.enabled():
+    app.router.route_class = profiling.TimedRoute
 
 origins = [
     "http://localhost:5173", # Vite default
     "http://127.0.0.1:5173",
 ]
 
+# Added before CORS so that rejected requests still get CORS headers.
+app.add_middleware(admission.AdmissionControl, **admission.settings_from_env())
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=origins,
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Data-Version"],
 )
 
+@app.middleware("http")
+async def pin_version(request: Request, call_next):
+    # Reads made while handling the request all see one consistent version.
+    # X-Data-Version reports that version, or for a write the one it
+    # published, so clients can order responses without reloading.
+    with database.pin():
+        response = await call_next(request)
+        if request.method in admission.MUTATING_METHODS:
+            response.headers["X-Data-Version"] = str(database.latest_version_number())
+        else:
+            response.headers["X-Data-Version"] = str(database.current_version().number)
+        return response
+
+# Outermost, so its timings cover every other middleware. Not installed at
+# all unless an admin token is configured.
+if profiling.enabled():
+    app.add_middleware(profiling.ProfilingMiddleware)
+
+coalescer = coalesce.SingleFlight()
+task_list_adapter = TypeAdapter(List[Task])
+
+async def coalesced_task_list(request: Request, load: Callable[[], List[Task]]) -> Response:
+    # Identical reads of the same data version share one load and encoding,
+    # done off the event loop so concurrent requests can join it.
+    key = (
+        request.url.path,
+        tuple(sorted(request.query_params.multi_items())),
+        database.current_version().number,
+    )
+
+    def encode() -> bytes:
+        tasks = load()
+        with profiling.phase("encode"):
+            return task_list_adapter.dump_json(tasks)
+
+    body = await coalescer.do(key, lambda: run_in_threadpool(profiling.follow(encode)))
+    return Response(content=body, media_type="application/json")
+
 @app.get("/tasks", response_model=List[Task])
-async def read_tasks():
-    return database.get_tasks()
+async def read_tasks(request: Request, tag: Optional[List[str]] = Query(None), match: Literal["all", "any"] = "all"):
+    if tag:
+        return await coalesced_task_list(request, lambda: database.get_tasks_by_tags(tag, match_all=match == "all"))
+    return await coalesced_task_list(request, database.get_tasks)
+
+@app.get("/tags", response_model=Dict[str, int])
+async def read_tag_counts():
+    return database.get_tag_counts()
+
+@app.get("/tasks/overdue", response_model=List[Task])
+async def read_overdue_tasks():
+    return sorted(scheduler.overdue.values(), key=lambda t: t.due_date)
+
+@app.get("/tasks/ready", response_model=List[Task])
+async def read_ready_tasks(request: Request):
+    return await coalesced_task_list(request, database.get_ready_tasks)
+
+@app.get("/tasks/agenda", response_model=Agenda)
+async def read_agenda(
+    start: Optional[date] = Query(None, alias="from"),
+    end: Optional[date] = Query(None, alias="to"),
+    group: Literal["day", "week", "month"] = "day",
+    include_undated: bool = False,
+):
+    # Defaults to the next four weeks from today.
+    start = start or date.today()
+    end = end or start + timedelta(days=27)
+    if end < start:
+        raise HTTPException(status_code=400, detail="'to' must not be before 'from'")
+    return database.get_agenda(start, end, group, include_undated)
+
+@app.get("/tasks/{task_id}", response_model=Task)
+async def read_task(task_id: str):
+    task = database.get_task(task_id)
+    if task is None:
+        raise HTTPException(status_code=404, detail="Task not found")
+    return task
 
 @app.post("/tasks", response_model=Task)
-async def create_task(task: TaskCreate):
-    return database.add_task(task)
+async def create_task(task: TaskCreate, actor: Optional[str] = Header(None, alias="X-Actor")):
+    try:
+        return database.add_task(task, actor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
 @app.put("/tasks/{task_id}", response_model=Task)
-async def update_task(task_id: str, task: TaskCreate):
-    updated_task = database.update_task(task_id, task)
+async def update_task(task_id: str, task: TaskCreate, actor: Optional[str] = Header(None, alias="X-Actor")):
+    try:
+        updated_task = database.update_task(task_id, task, actor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     if updated_task is None:
         raise HTTPException(status_code=404, detail="Task not found")
     return updated_task
 
 @app.delete("/tasks/{task_id}")
-async def delete_task(task_id: str):
-    success = database.delete_task(task_id)
+async def delete_task(task_id: str, actor: Optional[str] = Header(None, alias="X-Actor")):
+    success = database.delete_task(task_id, actor)
     if not success:
         raise HTTPException(status_code=404, detail="Task not found")
-    return {"message": "Task deleted successfully"}
+    return {"message": "Task deleted successfully", "id": task_id, "version": database.latest_version_number()}
+
+@app.get("/trash", response_model=List[Task])
+async def read_trash(request: Request):
+    return await coalesced_task_list(request, database.get_trash)
+
+@app.post("/trash/{task_id}/restore", response_model=Task)
+async def restore_task(task_id: str, actor: Optional[str] = Header(None, alias="X-Actor")):
+    try:
+        restored_task = database.restore_task(task_id, actor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if restored_task is None:
+        raise HTTPException(status_code=404, detail="Task not found in trash")
+    return restored_task
+
+@app.get("/tasks/{task_id}/history", response_model=List[Revision])
+async def read_task_history(task_id: str):
+    revisions = history.revisions(task_id)
+    if not revisions:
+        raise HTTPException(status_code=404, detail="No history for task")
+    return revisions
+
+@app.get("/tasks/{task_id}/history/{rev}", response_model=Task)
+async def read_task_revision(task_id: str, rev: int):
+    task = history.reconstruct(task_id, rev)
+    if task is None:
+        raise HTTPException(status_code=404, detail="Revision not found")
+    return task
+
+@app.get("/tasks/{task_id}/subtree", response_model=TaskNode)
+async def read_subtree(task_id: str):
+    subtree = database.get_subtree(task_id)
+    if subtree is None:
+        raise HTTPException(status_code=404, detail="Task not found")
+    return subtree
+
+@app.get("/views", response_model=List[View])
+async def read_views():
+    return database.get_views()
+
+@app.get("/views/{name}", response_model=List[Task])
+async def read_view(request: Request, name: str, offset: int = Query(0, ge=0), limit: Optional[int] = Query(None, ge=0)):
+    if not database.has_view(name):
+        raise HTTPException(status_code=404, detail="View not found")
+    return await coalesced_task_list(request, lambda: database.get_view_tasks(name, offset, limit) or [])
+
+@app.get("/views/{name}/definition", response_model=View)
+async def read_view_definition(name: str):
+    view = database.get_view(name)
+    if view is None:
+        raise HTTPException(status_code=404, detail="View not found")
+    return view
+
+@app.put("/views/{name}", response_model=View)
+async def save_view(name: str, definition: ViewDefinition):
+    return database.save_view(name, definition)
+
+@app.delete("/views/{name}")
+async def delete_view(name: str):
+    if not database.delete_view(name):
+        raise HTTPException(status_code=404, detail="View not found")
+    return {"message": "View deleted successfully"}
+
+@app.get("/metrics/coalescing")
+async def read_coalescing_metrics():
+    return coalescer.stats()
+
+@app.get("/admin/slow-requests", dependencies=[Depends(profiling.require_admin)])
+async def read_slow_requests():
+    return list(reversed(profiling.slow_requests))
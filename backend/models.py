@@ -1,7 +1,19 @@
-from pydantic import BaseModel
-from typing import Optional
-from datetime import date
+from pydantic import BaseModel, field_validator
+from typing import Any, Dict, List, Literal, Optional
+from datetime import date, datetime
 from enum import Enum
+import re
+import sys
+
+# Snapshots store each list field as one string joined with a control
+# character (snapshot.LIST_SEPARATOR), so list items may not contain any.
+_CONTROL_CHARACTERS = re.compile(r"[\x00-\x1f\x7f]")
+
+def _reject_control_characters(values: List[str]) -> List[str]:
+    for value in values:
+        if _CONTROL_CHARACTERS.search(value):
+            raise ValueError(f"{value!r} contains a control character")
+    return values
 
 class Priority(str, Enum):
     low = "Low"
@@ -20,9 +32,73 @@ class TaskBase(BaseModel):
     category: Optional[Category] = None
     due_date: Optional[date] = None
     completed: bool = False
+    parent_id: Optional[str] = None
+    depends_on: List[str] = []
+    tags: List[str] = []
+
+    @field_validator("depends_on")
+    @classmethod
+    def dedupe_depends_on(cls, value: List[str]) -> List[str]:
+        return list(dict.fromkeys(_reject_control_characters(value)))
+
+    @field_validator("tags")
+    @classmethod
+    def normalize_tags(cls, value: List[str]) -> List[str]:
+        # Interned so every task sharing a tag holds the same string object.
+        tags = _reject_control_characters([sys.intern(tag.strip()) for tag in value])
+        return list(dict.fromkeys(tag for tag in tags if tag))
 
 class TaskCreate(TaskBase):
     pass
 
 class Task(TaskBase):
     id: str
+    deleted_at: Optional[datetime] = None
+
+class FieldChange(BaseModel):
+    old: Any = None
+    new: Any = None
+
+class Revision(BaseModel):
+    task_id: str
+    rev: int
+    at: Optional[datetime] = None
+    actor: Optional[str] = None
+    op: str
+    changes: Dict[str, FieldChange]
+
+class TaskNode(BaseModel):
+    task: Task
+    subtasks_total: int
+    subtasks_completed: int
+    children: List["TaskNode"] = []
+
+class ViewFilter(BaseModel):
+    completed: Optional[bool] = None
+    priority: List[Priority] = []
+    category: List[Category] = []
+    # A task must carry every one of these tags.
+    tags: List[str] = []
+    # Due within this many days from today, overdue tasks included.
+    due_within_days: Optional[int] = None
+
+class ViewDefinition(BaseModel):
+    filter: ViewFilter = ViewFilter()
+    sort: Literal["due_date", "priority", "title"] = "due_date"
+    descending: bool = False
+
+class View(ViewDefinition):
+    name: str
+    count: int = 0
+
+class AgendaBucket(BaseModel):
+    start: date
+    end: date
+    tasks: List[Task]
+
+class Agenda(BaseModel):
+    start: date
+    end: date
+    group: Literal["day", "week", "month"]
+    buckets: List[AgendaBucket]
+    undated: List[Task] = []
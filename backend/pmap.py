@@ -0,0 +1,278 @@
+from bisect import bisect_left, bisect_right
+from typing import Any, Iterable, Iterator, Optional, Tuple
+
+_BITS = 5
+_WIDTH = 1 << _BITS
+_MASK = _WIDTH - 1
+_HASH_MASK = (1 << 64) - 1
+_EMPTY_NODE = (None,) * _WIDTH
+_MISSING = object()
+
+class _Entry:
+    __slots__ = ("hash", "key", "value")
+
+    def __init__(self, hash: int, key: Any, value: Any):
+        self.hash = hash
+        self.key = key
+        self.value = value
+
+class _Collision:
+    # Keys whose full hashes are equal.
+    __slots__ = ("hash", "entries")
+
+    def __init__(self, hash: int, entries: Tuple[Tuple[Any, Any], ...]):
+        self.hash = hash
+        self.entries = entries
+
+def _hash(key: Any) -> int:
+    return hash(key) & _HASH_MASK
+
+def _merge(a, b, shift: int):
+    # Build the smallest subtree holding two leaves with different hashes.
+    ia, ib = (a.hash >> shift) & _MASK, (b.hash >> shift) & _MASK
+    node = list(_EMPTY_NODE)
+    if ia == ib:
+        node[ia] = _merge(a, b, shift + _BITS)
+    else:
+        node[ia], node[ib] = a, b
+    return tuple(node)
+
+def _set(node: tuple, shift: int, h: int, key: Any, value: Any) -> Tuple[tuple, bool]:
+    i = (h >> shift) & _MASK
+    slot = node[i]
+    added = True
+    if slot is None:
+        new = _Entry(h, key, value)
+    elif type(slot) is tuple:
+        new, added = _set(slot, shift + _BITS, h, key, value)
+    elif slot.hash != h:
+        new = _merge(slot, _Entry(h, key, value), shift + _BITS)
+    elif type(slot) is _Entry:
+        if slot.key == key:
+            new, added = _Entry(h, key, value), False
+        else:
+            new = _Collision(h, ((slot.key, slot.value), (key, value)))
+    else:
+        entries = tuple((k, v) for k, v in slot.entries if k != key)
+        added = len(entries) == len(slot.entries)
+        new = _Collision(h, entries + ((key, value),))
+    return node[:i] + (new,) + node[i + 1:], added
+
+def _compact(node: tuple):
+    # A subtree left empty disappears and one left with a single leaf is
+    # replaced by it; leaves carry their full hash, so they can sit higher.
+    leaf = None
+    for slot in node:
+        if slot is None:
+            continue
+        if leaf is not None or type(slot) is tuple:
+            return node
+        leaf = slot
+    return leaf
+
+def _remove(node: tuple, shift: int, h: int, key: Any) -> Tuple[tuple, bool]:
+    i = (h >> shift) & _MASK
+    slot = node[i]
+    if slot is None:
+        return node, False
+    if type(slot) is tuple:
+        new, removed = _remove(slot, shift + _BITS, h, key)
+        if not removed:
+            return node, False
+        new = _compact(new)
+    elif slot.hash != h:
+        return node, False
+    elif type(slot) is _Entry:
+        if slot.key != key:
+            return node, False
+        new = None
+    else:
+        entries = tuple((k, v) for k, v in slot.entries if k != key)
+        if len(entries) == len(slot.entries):
+            return node, False
+        new = _Entry(h, *entries[0]) if len(entries) == 1 else _Collision(h, entries)
+    return node[:i] + (new,) + node[i + 1:], True
+
+def _items(node: tuple) -> Iterator[Tuple[Any, Any]]:
+    for slot in node:
+        if slot is None:
+            continue
+        if type(slot) is tuple:
+            yield from _items(slot)
+        elif type(slot) is _Entry:
+            yield slot.key, slot.value
+        else:
+            yield from slot.entries
+
+class PMap:
+    """Persistent hash map (a hash array mapped trie).
+
+    set() returns a new map and leaves this one untouched; the two share
+    every node off the path to the changed key, so an update copies at most
+    one 32-slot tuple per level.
+    """
+
+    __slots__ = ("_root", "_len")
+
+    def __init__(self, _root: tuple = _EMPTY_NODE, _len: int = 0):
+        self._root = _root
+        self._len = _len
+
+    def __len__(self) -> int:
+        return self._len
+
+    def __contains__(self, key: Any) -> bool:
+        return self.get(key, _MISSING) is not _MISSING
+
+    def get(self, key: Any, default: Any = None) -> Any:
+        h = _hash(key)
+        node, shift = self._root, 0
+        while True:
+            slot = node[(h >> shift) & _MASK]
+            if slot is None:
+                return default
+            if type(slot) is tuple:
+                node, shift = slot, shift + _BITS
+                continue
+            if slot.hash != h:
+                return default
+            if type(slot) is _Entry:
+                return slot.value if slot.key == key else default
+            for k, v in slot.entries:
+                if k == key:
+                    return v
+            return default
+
+    def set(self, key: Any, value: Any) -> "PMap":
+        root, added = _set(self._root, 0, _hash(key), key, value)
+        return PMap(root, self._len + added)
+
+    def remove(self, key: Any) -> "PMap":
+        root, removed = _remove(self._root, 0, _hash(key), key)
+        return PMap(root, self._len - 1) if removed else self
+
+    def items(self) -> Iterator[Tuple[Any, Any]]:
+        return _items(self._root)
+
+    def keys(self) -> Iterator[Any]:
+        return (key for key, _ in _items(self._root))
+
+class PSet:
+    """Persistent set on top of PMap."""
+
+    __slots__ = ("_map",)
+
+    def __init__(self, items: Iterable[Any] = (), _map: Optional[PMap] = None):
+        if _map is None:
+            _map = PMap()
+            for item in items:
+                _map = _map.set(item, True)
+        self._map = _map
+
+    def __len__(self) -> int:
+        return len(self._map)
+
+    def __contains__(self, item: Any) -> bool:
+        return item in self._map
+
+    def __iter__(self) -> Iterator[Any]:
+        return self._map.keys()
+
+    def add(self, item: Any) -> "PSet":
+        return self if item in self._map else PSet(_map=self._map.set(item, True))
+
+    def discard(self, item: Any) -> "PSet":
+        return PSet(_map=self._map.remove(item)) if item in self._map else self
+
+class PSortedList:
+    """Persistent sorted list of distinct items, stored as sorted chunks.
+
+    add() and remove() copy one chunk plus the tuple of chunk references, so
+    an update costs O(CHUNK + N / CHUNK) instead of O(N).
+    """
+
+    CHUNK = 256
+
+    __slots__ = ("_chunks", "_maxes", "_len")
+
+    def __init__(self, _chunks: Tuple[tuple, ...] = (), _len: int = 0):
+        self._chunks = _chunks
+        self._maxes = tuple(chunk[-1] for chunk in _chunks)
+        self._len = _len
+
+    @classmethod
+    def from_sorted(cls, items: Iterable[Any]) -> "PSortedList":
+        items = tuple(items)
+        chunks = tuple(items[i:i + cls.CHUNK] for i in range(0, len(items), cls.CHUNK))
+        return cls(chunks, len(items))
+
+    def __len__(self) -> int:
+        return self._len
+
+    def __iter__(self) -> Iterator[Any]:
+        for chunk in self._chunks:
+            yield from chunk
+
+    def __reversed__(self) -> Iterator[Any]:
+        for chunk in reversed(self._chunks):
+            yield from reversed(chunk)
+
+    def irange(self, minimum: Any, maximum: Any, reverse: bool = False) -> Iterator[Any]:
+        # Items from minimum to maximum inclusive, in order or, with reverse, backwards.
+        return self._descend(minimum, maximum) if reverse else self._ascend(minimum, maximum)
+
+    def _ascend(self, minimum: Any, maximum: Any) -> Iterator[Any]:
+        i = bisect_left(self._maxes, minimum)
+        if i == len(self._chunks):
+            return
+        j = bisect_left(self._chunks[i], minimum)
+        for chunk in self._chunks[i:]:
+            for item in chunk[j:]:
+                if item > maximum:
+                    return
+                yield item
+            j = 0
+
+    def _descend(self, minimum: Any, maximum: Any) -> Iterator[Any]:
+        if not self._chunks:
+            return
+        i = min(bisect_left(self._maxes, maximum), len(self._chunks) - 1)
+        j = bisect_right(self._chunks[i], maximum)
+        for chunk in reversed(self._chunks[:i + 1]):
+            for item in reversed(chunk[:j]):
+                if item < minimum:
+                    return
+                yield item
+            j = None
+
+    def bisect_left(self, item: Any) -> int:
+        # Number of items less than item.
+        i = bisect_left(self._maxes, item)
+        if i == len(self._chunks):
+            return self._len
+        return sum(len(chunk) for chunk in self._chunks[:i]) + bisect_left(self._chunks[i], item)
+
+    def _replace(self, i: int, new_chunks: Tuple[tuple, ...], delta: int) -> "PSortedList":
+        return PSortedList(self._chunks[:i] + new_chunks + self._chunks[i + 1:], self._len + delta)
+
+    def add(self, item: Any) -> "PSortedList":
+        if not self._chunks:
+            return PSortedList(((item,),), 1)
+        i = min(bisect_left(self._maxes, item), len(self._chunks) - 1)
+        chunk = self._chunks[i]
+        j = bisect_left(chunk, item)
+        chunk = chunk[:j] + (item,) + chunk[j:]
+        if len(chunk) > 2 * self.CHUNK:
+            return self._replace(i, (chunk[:self.CHUNK], chunk[self.CHUNK:]), 1)
+        return self._replace(i, (chunk,), 1)
+
+    def remove(self, item: Any) -> "PSortedList":
+        i = bisect_left(self._maxes, item)
+        if i == len(self._chunks):
+            raise KeyError(item)
+        chunk = self._chunks[i]
+        j = bisect_left(chunk, item)
+        if chunk[j] != item:
+            raise KeyError(item)
+        chunk = chunk[:j] + chunk[j + 1:]
+        return self._replace(i, (chunk,) if chunk else (), -1)
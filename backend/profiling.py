@@ -0,0 +1,262 @@
+"""On-demand request profiling and slow-request logging.
+
+Nothing here is installed unless TODO_ADMIN_TOKEN is set. With it set, each
+request records a per-phase timing breakdown, requests slower than
+TODO_SLOW_REQUEST_MS are kept in a ring buffer served at
+/admin/slow-requests, and a request is profiled when it is sampled
+(TODO_PROFILE_SAMPLE_RATE) or asks for it with the headers
+"X-Profile: pstats|collapsed" and "X-Admin-Token". Profiles are written to
+TODO_PROFILE_DIR. Work a request hands to the threadpool is profiled too when
+it is wrapped in follow().
+"""
+import cProfile
+import functools
+import os
+import pstats
+import random
+import re
+import secrets
+import sys
+import threading
+import time
+from collections import Counter, deque
+from contextlib import nullcontext
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from typing import Dict, Optional
+from fastapi import Header, HTTPException
+from fastapi.routing import APIRoute
+
+ADMIN_TOKEN = os.environ.get("TODO_ADMIN_TOKEN")
+SAMPLE_RATE = float(os.environ.get("TODO_PROFILE_SAMPLE_RATE", "0"))
+PROFILE_DIR = os.environ.get("TODO_PROFILE_DIR", "profiles")
+PROFILE_FORMAT = os.environ.get("TODO_PROFILE_FORMAT", "pstats")
+SLOW_REQUEST_MS = float(os.environ.get("TODO_SLOW_REQUEST_MS", "500"))
+SAMPLE_INTERVAL = 0.001
+
+slow_requests: deque = deque(maxlen=100)
+
+_timings: ContextVar[Optional[Dict[str, float]]] = ContextVar("phase_timings", default=None)
+_active: ContextVar[Optional["_Profile"]] = ContextVar("active_profile", default=None)
+_NOT_TIMED = nullcontext()
+
+# Held while a profile runs. Both profilers watch the whole event loop thread,
+# so overlapping profiles would add nothing, and cProfile refuses a second
+# active profiler on Python 3.12; a request arriving meanwhile is not profiled.
+# Threads joining through follow() only ever add to the one running profile.
+_profile_lock = threading.Lock()
+
+def enabled() -> bool:
+    return bool(ADMIN_TOKEN)
+
+class _Phase:
+    __slots__ = ("timings", "name", "start")
+
+    def __init__(self, timings: Dict[str, float], name: str):
+        self.timings = timings
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+
+    def __exit__(self, *exc_info):
+        elapsed = time.perf_counter() - self.start
+        self.timings[self.name] = self.timings.get(self.name, 0.0) + elapsed
+
+def phase(name: str):
+    # Outside a timed request this is one context variable lookup.
+    timings = _timings.get()
+    if timings is None:
+        return _NOT_TIMED
+    return _Phase(timings, name)
+
+def require_admin(x_admin_token: Optional[str] = Header(None)):
+    if not ADMIN_TOKEN or not x_admin_token or not secrets.compare_digest(x_admin_token, ADMIN_TOKEN):
+        raise HTTPException(status_code=403, detail="Admin token required")
+
+class TimedRoute(APIRoute):
+    # Times the endpoint itself, so what is left of the request is routing,
+    # response validation and serialization.
+
+    def __init__(self, path: str, endpoint, **kwargs):
+        @functools.wraps(endpoint)
+        async def timed_endpoint(*args, **kw):
+            with phase("handler"):
+                return await endpoint(*args, **kw)
+
+        super().__init__(path, timed_endpoint, **kwargs)
+
+class _StackSampler(threading.Thread):
+    # Samples the watched threads' stacks at a fixed interval into
+    # collapsed-stack counts. Threads are watched or dropped while it runs.
+
+    def __init__(self, thread_id: int):
+        super().__init__(daemon=True)
+        self.thread_ids = {thread_id}
+        self.stacks: Counter = Counter()
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.wait(SAMPLE_INTERVAL):
+            frames = sys._current_frames()
+            for thread_id in list(self.thread_ids):
+                frame = frames.get(thread_id)
+                names = []
+                while frame is not None:
+                    code = frame.f_code
+                    names.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                    frame = frame.f_back
+                if names:
+                    self.stacks[";".join(reversed(names))] += 1
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+class _Profile:
+    def __init__(self, fmt: str):
+        self.fmt = fmt
+        if fmt == "collapsed":
+            self._sampler = _StackSampler(threading.get_ident())
+            self._sampler.start()
+        else:
+            self._profiler = cProfile.Profile()
+            self._profiler.enable()
+            # Profilers of threadpool work, merged into this one when written.
+            self._thread_profilers = []
+
+    @classmethod
+    def start(cls, fmt: str) -> Optional["_Profile"]:
+        if not _profile_lock.acquire(blocking=False):
+            return None
+        try:
+            return cls(fmt)
+        except BaseException:
+            _profile_lock.release()
+            raise
+
+    def run_in_thread(self, fn, *args):
+        # Runs fn in the calling worker thread, adding its work to this profile.
+        if self.fmt == "collapsed":
+            thread_id = threading.get_ident()
+            self._sampler.thread_ids.add(thread_id)
+            try:
+                return fn(*args)
+            finally:
+                self._sampler.thread_ids.discard(thread_id)
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            # Python 3.12+: the request's profiler already sees every thread.
+            return fn(*args)
+        try:
+            return fn(*args)
+        finally:
+            profiler.disable()
+            self._thread_profilers.append(profiler)
+
+    def finish(self, method: str, path: str) -> str:
+        try:
+            return self._write(method, path)
+        finally:
+            _profile_lock.release()
+
+    def _write(self, method: str, path: str) -> str:
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S%f")
+        name = f"{stamp}-{method}-{re.sub(r'[^A-Za-z0-9]+', '_', path).strip('_')}"
+        if self.fmt == "collapsed":
+            self._sampler.stop()
+            name += ".collapsed"
+            with open(os.path.join(PROFILE_DIR, name), "w") as f:
+                for stack, count in self._sampler.stacks.most_common():
+                    f.write(f"{stack} {count}\n")
+        else:
+            self._profiler.disable()
+            name += ".prof"
+            stats = pstats.Stats(self._profiler)
+            for profiler in self._thread_profilers:
+                stats.add(profiler)
+            stats.dump_stats(os.path.join(PROFILE_DIR, name))
+        return name
+
+def follow(fn):
+    # Wraps a callable bound for the threadpool so a profile of the request
+    # handing it over covers it too. The context, and with it the active
+    # profile, is copied into the worker thread.
+    @functools.wraps(fn)
+    def followed(*args):
+        profile = _active.get()
+        if profile is None:
+            return fn(*args)
+        return profile.run_in_thread(fn, *args)
+
+    return followed
+
+class ProfilingMiddleware:
+    """ASGI middleware collecting phase timings and taking profiles.
+
+    cProfile and the stack sampler watch the event loop thread, so work from
+    other requests interleaved on the loop shows up in a profile as well,
+    plus any threadpool work the request hands over through follow(). Only
+    one profile runs at a time; see _profile_lock.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    def _requested_format(self, scope) -> Optional[str]:
+        headers = dict(scope["headers"])
+        requested = headers.get(b"x-profile")
+        token = headers.get(b"x-admin-token", b"").decode()
+        if requested and token and secrets.compare_digest(token, ADMIN_TOKEN):
+            fmt = requested.decode()
+            return fmt if fmt in ("pstats", "collapsed") else PROFILE_FORMAT
+        if SAMPLE_RATE and random.random() < SAMPLE_RATE:
+            return PROFILE_FORMAT
+        return None
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        timings: Dict[str, float] = {}
+        token = _timings.set(timings)
+        profile = None
+        profile_token = None
+        status = 500
+        profile_name = None
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        start = time.perf_counter()
+        try:
+            fmt = self._requested_format(scope)
+            if fmt:
+                profile = _Profile.start(fmt)
+                profile_token = _active.set(profile)
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            total = time.perf_counter() - start
+            _timings.reset(token)
+            if profile_token is not None:
+                _active.reset(profile_token)
+            if profile is not None:
+                profile_name = profile.finish(scope["method"], scope["path"])
+            if total * 1000 >= SLOW_REQUEST_MS or profile_name:
+                phases = {name: round(seconds * 1000, 3) for name, seconds in timings.items()}
+                phases["response"] = round((total - timings.get("handler", 0.0)) * 1000, 3)
+                slow_requests.append({
+                    "at": datetime.now(timezone.utc).isoformat(),
+                    "method": scope["method"],
+                    "path": scope["path"],
+                    "status": status,
+                    "total_ms": round(total * 1000, 3),
+                    "phases_ms": phases,
+                    "profile": profile_name,
+                })
@@ -0,0 +1,183 @@
+import asyncio
+import heapq
+import json
+import logging
+import os
+import urllib.request
+from datetime import datetime, time, timedelta
+from typing import Callable, Dict, List, Optional, Tuple
+from models import Task
+
+logger = logging.getLogger("todo.reminders")
+
+Notifier = Callable[[Task], None]
+
+# Upper bound on a single sleep so wall-clock jumps are picked up eventually.
+MAX_SLEEP_SECONDS = 3600.0
+
+def log_notifier(task: Task):
+    logger.warning("Task %s (%r) is overdue, was due %s", task.id, task.title, task.due_date)
+
+class WebhookNotifier:
+    def __init__(self, url: str, timeout: float = 5.0):
+        self.url = url
+        self.timeout = timeout
+
+    def __call__(self, task: Task):
+        body = json.dumps({"event": "task.overdue", "task": task.model_dump(mode="json")}).encode()
+        request = urllib.request.Request(
+            self.url, data=body, headers={"Content-Type": "application/json"}, method="POST"
+        )
+        with urllib.request.urlopen(request, timeout=self.timeout):
+            pass
+
+def notifier_from_env() -> Notifier:
+    url = os.environ.get("TODO_REMINDER_WEBHOOK")
+    return WebhookNotifier(url) if url else log_notifier
+
+def load_checked_through(path: str) -> Optional[datetime]:
+    try:
+        with open(path, "r") as f:
+            return datetime.fromisoformat(json.load(f)["checked_through"])
+    except (FileNotFoundError, json.JSONDecodeError, KeyError, ValueError):
+        return None
+
+def save_checked_through(path: str, when: datetime):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump({"checked_through": when.isoformat()}, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+def deadline_for(task: Task) -> Optional[datetime]:
+    # A task becomes overdue once its due date has fully passed.
+    if task.completed or task.due_date is None:
+        return None
+    return datetime.combine(task.due_date + timedelta(days=1), time.min)
+
+class OverdueScheduler:
+    """Keeps a min-heap of upcoming deadlines and emits overdue events.
+
+    The heap is maintained from storage change events, so each add, update
+    or delete costs O(log N). Superseded heap entries are skipped lazily when
+    they reach the top.
+
+    checked_through is the time up to which deadlines have been handled. It
+    is saved to state_file after each round of notifications, so a restart
+    notifies what fell due while the server was down and nothing earlier.
+    """
+
+    def __init__(self, notifier: Notifier = log_notifier, clock: Callable[[], datetime] = datetime.now):
+        self.notifier = notifier
+        self.clock = clock
+        self.overdue: Dict[str, Task] = {}
+        self._heap: List[Tuple[datetime, str]] = []
+        self._deadlines: Dict[str, datetime] = {}
+        self._pending: Dict[str, Task] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self.checked_through: Optional[datetime] = None
+        self.state_file: Optional[str] = None
+
+    def restore(self, state_file: str):
+        # Call before seeding.
+        self.state_file = state_file
+        self.checked_through = load_checked_through(state_file)
+
+    def on_change(self, old: Optional[Task], new: Optional[Task]):
+        task_id = (new or old).id
+        deadline = deadline_for(new) if new is not None else None
+
+        if task_id in self.overdue:
+            if deadline is not None and new.due_date == self.overdue[task_id].due_date:
+                # Still overdue for the same date: refresh it without notifying again.
+                self.overdue[task_id] = new
+                return
+            del self.overdue[task_id]
+
+        self._deadlines.pop(task_id, None)
+        self._pending.pop(task_id, None)
+        if deadline is None:
+            return
+
+        self._deadlines[task_id] = deadline
+        self._pending[task_id] = new
+        heapq.heappush(self._heap, (deadline, task_id))
+        if len(self._heap) > 2 * len(self._deadlines) + 64:
+            self._compact()
+        if self._heap[0] == (deadline, task_id):
+            self._wake()
+
+    def seed(self, task: Task):
+        # For tasks loaded at startup. One whose deadline an earlier run
+        # already checked is recorded as overdue without notifying again;
+        # with no record of an earlier run, that is every deadline passed.
+        deadline = deadline_for(task)
+        known = task.id in self.overdue or task.id in self._deadlines
+        checked_through = self.checked_through or self.clock()
+        if known or deadline is None or deadline > checked_through:
+            self.on_change(None, task)
+        else:
+            self.overdue[task.id] = task
+
+    def next_deadline(self) -> Optional[datetime]:
+        while self._heap:
+            deadline, task_id = self._heap[0]
+            if self._deadlines.get(task_id) == deadline:
+                return deadline
+            heapq.heappop(self._heap)
+        return None
+
+    def pop_due(self, now: datetime) -> List[Task]:
+        fired = []
+        while self._heap and self._heap[0][0] <= now:
+            deadline, task_id = heapq.heappop(self._heap)
+            if self._deadlines.get(task_id) != deadline:
+                continue
+            del self._deadlines[task_id]
+            task = self._pending.pop(task_id)
+            self.overdue[task_id] = task
+            fired.append(task)
+        return fired
+
+    async def run(self):
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        while True:
+            self._wakeup.clear()
+            now = self.clock()
+            for task in self.pop_due(now):
+                await self._loop.run_in_executor(None, self._emit, task)
+            # Only once notified, so a crash in between notifies again rather than never.
+            self.checked_through = now
+            if self.state_file is not None:
+                await self._loop.run_in_executor(None, self._save)
+            deadline = self.next_deadline()
+            timeout = MAX_SLEEP_SECONDS
+            if deadline is not None:
+                timeout = min(timeout, max(0.0, (deadline - self.clock()).total_seconds()))
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    def _emit(self, task: Task):
+        try:
+            self.notifier(task)
+        except Exception:
+            logger.exception("Overdue notifier failed for task %s", task.id)
+
+    def _save(self):
+        try:
+            save_checked_through(self.state_file, self.checked_through)
+        except OSError:
+            logger.exception("Failed to save %s", self.state_file)
+
+    def _wake(self):
+        if self._loop is not None and self._wakeup is not None:
+            self._loop.call_soon_threadsafe(self._wakeup.set)
+
+    def _compact(self):
+        self._heap = [(deadline, task_id) for task_id, deadline in self._deadlines.items()]
+        heapq.heapify(self._heap)
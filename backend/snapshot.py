@@ -0,0 +1,176 @@
+"""Binary, memory-mapped task snapshots.
+
+Layout (little endian):
+    header   magic b"TDSN", u16 version, u16 record size, u32 task count
+    records  one fixed-width record per task (RECORD below)
+    id index u32 record numbers ordered by task id, for binary search
+    heap     UTF-8 strings referenced by (offset, length) pairs in the records
+
+Strings that may be absent use NULL_LENGTH as their length. List fields are
+stored as a single heap string joined with LIST_SEPARATOR.
+"""
+import argparse
+import json
+import math
+import mmap
+import os
+import struct
+import sys
+from datetime import date, datetime, timezone
+from typing import Iterable, Iterator, List, Optional
+from models import Category, Priority, Task
+
+MAGIC = b"TDSN"
+VERSION = 1
+HEADER = struct.Struct("<4sHHI")
+# id, title, description, parent_id, depends_on, tags as (offset, length),
+# then due date ordinal, priority, category, completed, padding, deleted_at.
+RECORD = struct.Struct("<12IiBBBxd")
+INDEX_ENTRY = struct.Struct("<I")
+NULL_LENGTH = 0xFFFFFFFF
+LIST_SEPARATOR = "\x1f"
+
+PRIORITIES = list(Priority)
+CATEGORIES = [None] + list(Category)
+# Every field is present in a record; passing the set up front saves
+# model_construct from working it out per task.
+FIELDS_SET = set(Task.model_fields)
+
+class _Heap:
+    def __init__(self):
+        self.chunks: List[bytes] = []
+        self.size = 0
+
+    def add(self, value: Optional[str]):
+        if value is None:
+            return 0, NULL_LENGTH
+        data = value.encode()
+        offset = self.size
+        self.chunks.append(data)
+        self.size += len(data)
+        return offset, len(data)
+
+def write(path: str, tasks: Iterable[Task]):
+    tasks = list(tasks)
+    heap = _Heap()
+    records = []
+    ids = []
+    for task in tasks:
+        ids.append(task.id.encode())
+        records.append(RECORD.pack(
+            *heap.add(task.id),
+            *heap.add(task.title),
+            *heap.add(task.description),
+            *heap.add(task.parent_id),
+            *heap.add(LIST_SEPARATOR.join(task.depends_on)),
+            *heap.add(LIST_SEPARATOR.join(task.tags)),
+            task.due_date.toordinal() if task.due_date else 0,
+            PRIORITIES.index(task.priority),
+            CATEGORIES.index(task.category),
+            int(task.completed),
+            task.deleted_at.timestamp() if task.deleted_at else math.nan,
+        ))
+    order = sorted(range(len(tasks)), key=ids.__getitem__)
+
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, VERSION, RECORD.size, len(tasks)))
+        f.writelines(records)
+        f.writelines(INDEX_ENTRY.pack(i) for i in order)
+        f.writelines(heap.chunks)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+class Snapshot:
+    """Read-only view over a snapshot file; tasks are decoded on access."""
+
+    def __init__(self, path: str):
+        with open(path, "rb") as f:
+            size = os.fstat(f.fileno()).st_size
+            self._buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if size else b""
+        if len(self._buf) < HEADER.size:
+            raise ValueError(f"{path} is not a task snapshot")
+        magic, version, record_size, count = HEADER.unpack_from(self._buf, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a task snapshot")
+        if version != VERSION or record_size != RECORD.size:
+            raise ValueError(f"Unsupported snapshot version {version} in {path}")
+        self.count = count
+        self._records = HEADER.size
+        self._index = self._records + count * RECORD.size
+        self._heap = self._index + count * INDEX_ENTRY.size
+
+    def __len__(self) -> int:
+        return self.count
+
+    def __iter__(self) -> Iterator[Task]:
+        return (self.task(i) for i in range(self.count))
+
+    def _string(self, offset: int, length: int) -> Optional[str]:
+        if length == NULL_LENGTH:
+            return None
+        start = self._heap + offset
+        return self._buf[start:start + length].decode()
+
+    def _list(self, offset: int, length: int) -> List[str]:
+        value = self._string(offset, length)
+        return [sys.intern(s) for s in value.split(LIST_SEPARATOR)] if value else []
+
+    def id_at(self, i: int) -> str:
+        offset, length = struct.unpack_from("<2I", self._buf, self._records + i * RECORD.size)
+        return self._string(offset, length)
+
+    def ids(self) -> List[str]:
+        return [self.id_at(i) for i in range(self.count)]
+
+    def find(self, task_id: str) -> Optional[int]:
+        # Binary search over the id index; only the probed ids are decoded.
+        key = task_id.encode()
+        lo, hi = 0, self.count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            i = INDEX_ENTRY.unpack_from(self._buf, self._index + mid * INDEX_ENTRY.size)[0]
+            offset, length = struct.unpack_from("<2I", self._buf, self._records + i * RECORD.size)
+            start = self._heap + offset
+            probe = self._buf[start:start + length]
+            if probe == key:
+                return i
+            if probe < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        return None
+
+    def task(self, i: int) -> Task:
+        fields = RECORD.unpack_from(self._buf, self._records + i * RECORD.size)
+        due, priority, category, completed, deleted_at = fields[12:]
+        # Records were validated when written, so skip validation here.
+        return Task.model_construct(
+            FIELDS_SET,
+            id=self._string(*fields[0:2]),
+            title=self._string(*fields[2:4]),
+            description=self._string(*fields[4:6]),
+            parent_id=self._string(*fields[6:8]),
+            depends_on=self._list(*fields[8:10]),
+            tags=self._list(*fields[10:12]),
+            due_date=date.fromordinal(due) if due else None,
+            priority=PRIORITIES[priority],
+            category=CATEGORIES[category],
+            completed=bool(completed),
+            deleted_at=None if math.isnan(deleted_at) else datetime.fromtimestamp(deleted_at, timezone.utc),
+        )
+
+def convert(json_path: str, snapshot_path: str) -> int:
+    with open(json_path, "r") as f:
+        tasks = [Task(**t) for t in json.load(f)]
+    write(snapshot_path, tasks)
+    return len(tasks)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convert a tasks.json file into a binary snapshot.")
+    parser.add_argument("source", nargs="?", default="tasks.json")
+    parser.add_argument("target", nargs="?", default="tasks.snap")
+    args = parser.parse_args()
+    count = convert(args.source, args.target)
+    print(f"Wrote {count} tasks to {args.target}")
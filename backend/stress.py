@@ -0,0 +1,443 @@
+"""Concurrency stress and consistency checks for the storage layer and API.
+
+Workers run randomized create/update/delete/read mixes against one data file
+and keep a ledger of every change they were told succeeded. Afterwards the
+data is reloaded and checked against the ledgers:
+
+    lost         a task is missing or lacks the last title its owner wrote
+    resurrected  a deleted task is live again
+    strays       a task exists that no acknowledged create explains
+    stale        a worker read back something other than its own last write,
+                 or (processes mode) an older write of another worker's task
+                 than had been acknowledged before the read began
+    errors       a storage call or request failed outright
+
+Modes:
+
+    threads    worker threads calling database directly
+    processes  worker processes calling database on the same file
+    async      asyncio tasks calling the HTTP API, in-process or at --url
+    crash      a writer process SIGKILLed at a random point; the file must
+               still load and hold every write it acknowledged
+
+    python stress.py threads --workers 16 --ops 200
+    python stress.py crash --rounds 20 --format snap
+
+Exits with status 1 when any invariant is violated.
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import random
+import signal
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+import database
+import generate
+import snapshot
+from models import TaskCreate
+
+OPS = ("create", "update", "delete", "read")
+READER_MIX = (1, 0, 0, 20)
+
+# Task id -> last acknowledged title, or None once deleted.
+Ledger = Dict[str, Optional[str]]
+
+@dataclass
+class Result:
+    mode: str
+    workers: int
+    ops: int = 0
+    seconds: float = 0.0
+    rejected: int = 0
+    violations: Dict[str, List[str]] = field(default_factory=lambda: {
+        "lost": [], "resurrected": [], "strays": [], "stale": [], "errors": [],
+    })
+
+    def report(self) -> str:
+        rate = self.ops / self.seconds if self.seconds else 0.0
+        counts = "  ".join(f"{name} {len(found)}" for name, found in self.violations.items())
+        return (f"{self.mode:<10}{self.workers:>4} workers {self.ops:>8} ops {self.seconds:>8.2f}s "
+                f"{rate:>10.1f} ops/s  rejected {self.rejected}  {counts}")
+
+    def collect(self, workers: List["Worker"]):
+        for worker in workers:
+            self.violations["stale"].extend(worker.stale)
+            self.violations["errors"].extend(worker.errors)
+
+    def ok(self) -> bool:
+        return not any(self.violations.values())
+
+class Worker:
+    """One worker's random operation stream and its ledger."""
+
+    def __init__(self, run: str, worker: int, seed: int, mix: Tuple[float, ...]):
+        self.prefix = f"{run}-w{worker}"
+        self.rng = random.Random(f"{seed}-{worker}")
+        self.mix = mix
+        self.ledger: Ledger = {}
+        self.live: List[str] = []
+        self.stale: List[str] = []
+        self.errors: List[str] = []
+        self.n = 0
+        # Task id -> last acknowledged title across all workers, shared when
+        # workers should also read each other's tasks.
+        self.peers = None
+        # (task id, title acknowledged before the read, title read)
+        self.peer_reads: List[Tuple[str, Optional[str], Optional[str]]] = []
+
+    def next_op(self) -> Tuple[str, Optional[str], str]:
+        # Returns (op, task id, new title).
+        self.n += 1
+        op = self.rng.choices(OPS, self.mix)[0]
+        if not self.live:
+            op = "create"
+        task_id = None if op == "create" else self.rng.choice(self.live)
+        return op, task_id, f"{self.prefix}-{self.n}"
+
+    def applied(self, op: str, task_id: str, title: str):
+        if op in ("create", "update"):
+            if op == "create":
+                self.live.append(task_id)
+            self.ledger[task_id] = title
+        elif op == "delete":
+            self.live.remove(task_id)
+            self.ledger[task_id] = None
+        if self.peers is not None:
+            # Re-inserted, so the shared keys run from least to most recently written.
+            self.peers.pop(task_id, None)
+            self.peers[task_id] = self.ledger[task_id]
+
+    def check_read(self, task_id: str, title: Optional[str]):
+        if title != self.ledger[task_id]:
+            self.stale.append(task_id)
+
+    def read_peer(self):
+        # Reads a task some worker (maybe this one) wrote lately; checked
+        # against the final ledgers by check_peer_reads.
+        task_id = self.rng.choice(list(self.peers.keys())[-8:])
+        try:
+            acknowledged = self.peers[task_id]
+        except KeyError:
+            # Caught between its owner's pop and set.
+            return
+        task = database.get_task(task_id)
+        self.peer_reads.append((task_id, acknowledged, task.title if task else None))
+
+def storage_op(worker: Worker, op: str, task_id: Optional[str], title: str) -> Optional[str]:
+    # Runs one operation directly against database; returns the affected id,
+    # or None when the storage layer refused it.
+    if op == "create":
+        return database.add_task(TaskCreate(title=title)).id
+    if op == "update":
+        task = database.update_task(task_id, TaskCreate(title=title))
+        return task.id if task else None
+    if op == "delete":
+        return task_id if database.delete_task(task_id) else None
+    task = database.get_task(task_id)
+    worker.check_read(task_id, task.title if task else None)
+    return task_id
+
+def run_storage_worker(run: str, worker_id: int, ops: int, seed: int, mix, peers=None) -> Worker:
+    worker = Worker(run, worker_id, seed, mix)
+    worker.peers = peers
+    for _ in range(ops):
+        op, task_id, title = worker.next_op()
+        try:
+            if op == "read" and peers and worker.rng.random() < 0.5:
+                worker.read_peer()
+                continue
+            affected = storage_op(worker, op, task_id, title)
+        except Exception as e:
+            worker.errors.append(f"{op} {task_id or title}: {e!r}")
+            continue
+        if affected is None:
+            # The task was ours and live; refusing the change loses it.
+            worker.stale.append(task_id)
+        elif op != "read":
+            worker.applied(op, affected, title)
+    return worker
+
+def use_file(path: str):
+    # Point the storage layer at path, dropping anything held in memory.
+    database.DB_FILE = path
+    database.reset()
+
+def _process_worker(path: str, run: str, worker_id: int, ops: int, seed: int, mix, peers) -> Worker:
+    use_file(path)
+    worker = run_storage_worker(run, worker_id, ops, seed, mix, peers)
+    # The proxy does not pickle back to the parent.
+    worker.peers = None
+    return worker
+
+def _sequence(title: str) -> int:
+    # Titles end in the writing worker's operation counter.
+    return int(title.rsplit("-", 1)[1])
+
+def check_peer_reads(result: Result, workers: List[Worker]):
+    # A read may see a later write than the one acknowledged when it began,
+    # never an earlier one. Deletes are final, so a missing task is only
+    # fine when its owner deleted it in the end.
+    final = {}
+    for worker in workers:
+        final.update(worker.ledger)
+    for worker in workers:
+        for task_id, acknowledged, seen in worker.peer_reads:
+            if seen is None:
+                stale = final.get(task_id) is not None
+            else:
+                stale = acknowledged is None or _sequence(seen) < _sequence(acknowledged)
+            if stale:
+                result.violations["stale"].append(f"{task_id}: read {seen!r} after {acknowledged!r}")
+
+def load_state(path: str) -> Tuple[Dict[str, str], set]:
+    # Reload from disk, as a freshly started server would.
+    use_file(path)
+    live = {t.id: t.title for t in database.get_tasks()}
+    trash = {t.id for t in database.get_trash()}
+    return live, trash
+
+def check(result: Result, run: str, ledgers: List[Ledger], live: Dict[str, str],
+          allowed: Optional[Dict[str, set]] = None):
+    # allowed maps a task id to extra titles it may hold (None for deleted),
+    # e.g. the write a crashed process had in flight.
+    allowed = allowed or {}
+    known = {}
+    for ledger in ledgers:
+        known.update(ledger)
+    for task_id, title in known.items():
+        actual = live.get(task_id)
+        if actual == title or actual in allowed.get(task_id, ()):
+            continue
+        result.violations["resurrected" if title is None else "lost"].append(task_id)
+    for task_id, title in live.items():
+        if title.startswith(run) and task_id not in known and title not in allowed.get(None, ()):
+            result.violations["strays"].append(task_id)
+
+def stress_threads(path: str, args) -> Result:
+    result = Result("threads", args.workers)
+    run = uuid.uuid4().hex[:8]
+    outcomes = [None] * args.workers
+    use_file(path)
+
+    def target(i: int):
+        outcomes[i] = run_storage_worker(run, i, args.ops, args.seed, args.mix)
+
+    threads = [threading.Thread(target=target, args=(i,)) for i in range(args.workers)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    result.seconds = time.perf_counter() - start
+    result.ops = args.workers * args.ops
+    result.collect(outcomes)
+    check(result, run, [w.ledger for w in outcomes], load_state(path)[0])
+    return result
+
+def stress_processes(path: str, args) -> Result:
+    result = Result("processes", args.workers)
+    run = uuid.uuid4().hex[:8]
+    context = multiprocessing.get_context("spawn")
+    with context.Manager() as manager, context.Pool(args.workers) as pool:
+        # Workers also read each other's tasks, which only a reload from
+        # disk can show them.
+        peers = manager.dict()
+        jobs = [(path, run, i, args.ops, args.seed, args.mix, peers) for i in range(args.workers)]
+        # The last worker mostly reads, so it goes long stretches without a
+        # write of its own to reload on.
+        jobs[-1] = jobs[-1][:5] + (READER_MIX, peers)
+        start = time.perf_counter()
+        outcomes = pool.starmap(_process_worker, jobs)
+        result.seconds = time.perf_counter() - start
+    result.ops = args.workers * args.ops
+    result.collect(outcomes)
+    check_peer_reads(result, outcomes)
+    check(result, run, [w.ledger for w in outcomes], load_state(path)[0])
+    return result
+
+async def _http_worker(client, worker: Worker, ops: int) -> int:
+    rejected = 0
+    for _ in range(ops):
+        op, task_id, title = worker.next_op()
+        if op == "create":
+            response = await client.post("/tasks", json={"title": title})
+        elif op == "update":
+            response = await client.put(f"/tasks/{task_id}", json={"title": title})
+        elif op == "delete":
+            response = await client.delete(f"/tasks/{task_id}")
+        else:
+            response = await client.get(f"/tasks/{task_id}")
+        if response.status_code in (429, 503):
+            # Shed by admission control before reaching storage.
+            rejected += 1
+            continue
+        if op == "read":
+            worker.check_read(task_id, response.json()["title"] if response.status_code == 200 else None)
+        elif response.status_code != 200:
+            worker.errors.append(f"{op} {task_id or title}: HTTP {response.status_code}")
+        else:
+            worker.applied(op, response.json()["id"] if op == "create" else task_id, title)
+    return rejected
+
+async def _stress_async(path: str, args) -> Result:
+    import httpx
+
+    result = Result("async", args.workers)
+    run = uuid.uuid4().hex[:8]
+    if args.url:
+        client = httpx.AsyncClient(base_url=args.url, timeout=30)
+    else:
+        use_file(path)
+        import main
+        client = httpx.AsyncClient(transport=httpx.ASGITransport(app=main.app), base_url="http://stress")
+
+    workers = [Worker(run, i, args.seed, args.mix) for i in range(args.workers)]
+    async with client:
+        start = time.perf_counter()
+        rejected = await asyncio.gather(*(_http_worker(client, w, args.ops) for w in workers))
+        result.seconds = time.perf_counter() - start
+        if args.url:
+            live = {t["id"]: t["title"] for t in (await client.get("/tasks")).json()}
+    if not args.url:
+        live = load_state(path)[0]
+    result.ops = args.workers * args.ops
+    result.rejected = sum(rejected)
+    result.collect(workers)
+    check(result, run, [w.ledger for w in workers], live)
+    return result
+
+def stress_async(path: str, args) -> Result:
+    return asyncio.run(_stress_async(path, args))
+
+def crash_child(path: str, run: str, seed: int, mix):
+    # Writes until killed. Every operation is announced before it starts and
+    # acknowledged once the storage call returns.
+    use_file(path)
+    worker = Worker(run, 0, seed, mix)
+    while True:
+        op, task_id, title = worker.next_op()
+        print(f"begin {op} {task_id or '-'} {title}", flush=True)
+        affected = storage_op(worker, op, task_id, title)
+        if affected is not None and op != "read":
+            worker.applied(op, affected, title)
+        print(f"ack {affected or '-'}", flush=True)
+        if database.is_snapshot() and worker.n % 50 == 0:
+            # Compaction is the only full rewrite in snapshot mode.
+            database.purge_trash()
+
+def stress_crash(path: str, args) -> Result:
+    result = Result("crash", 1)
+    json_path = os.path.splitext(path)[0] + ".json"
+    baseline = generate.write_dataset(json_path, args.baseline, args.seed)
+    if path != json_path:
+        snapshot.convert(json_path, path)
+    env = dict(os.environ, PYTHONPATH=os.path.dirname(os.path.abspath(__file__)))
+    rng = random.Random(args.seed)
+
+    for round_number in range(args.rounds):
+        run = f"{uuid.uuid4().hex[:8]}r{round_number}"
+        child = subprocess.Popen(
+            [sys.executable, os.path.abspath(__file__), "_crash_child", path, run, str(args.seed)],
+            env=env, stdout=subprocess.PIPE, text=True,
+        )
+        start = time.perf_counter()
+        time.sleep(rng.uniform(0.2, 1.0))
+        child.send_signal(signal.SIGKILL)
+        result.seconds += time.perf_counter() - start
+        output, _ = child.communicate()
+
+        # Replay the child's acknowledged operations into a ledger; the one
+        # in flight when it died may or may not have landed.
+        ledger: Ledger = {}
+        allowed: Dict[Optional[str], set] = {}
+        pending = None
+        for line in output.splitlines():
+            parts = line.split(" ")
+            if parts[0] == "begin" and len(parts) == 4:
+                pending = parts[1:]
+                result.ops += 1
+            elif parts[0] == "ack" and len(parts) == 2 and pending:
+                op, _, title = pending
+                if op in ("create", "update") and parts[1] != "-":
+                    ledger[parts[1]] = title
+                elif op == "delete" and parts[1] != "-":
+                    ledger[parts[1]] = None
+                pending = None
+        if pending:
+            op, task_id, title = pending
+            if op == "create":
+                allowed[None] = {title}
+            elif op in ("update", "delete"):
+                allowed[task_id] = {title if op == "update" else None}
+
+        if not path.endswith(".snap"):
+            try:
+                with open(path) as f:
+                    json.load(f)
+            except (OSError, json.JSONDecodeError) as e:
+                result.violations["lost"].append(f"round {round_number}: {path} does not parse ({e})")
+                continue
+        try:
+            live, _ = load_state(path)
+        except Exception as e:
+            result.violations["lost"].append(f"round {round_number}: load failed ({e!r})")
+            continue
+        check(result, run, [ledger], live, allowed)
+        missing = [task_id for task_id in baseline if task_id not in live]
+        result.violations["lost"].extend(missing)
+    return result
+
+MODES = {
+    "threads": stress_threads,
+    "processes": stress_processes,
+    "async": stress_async,
+    "crash": stress_crash,
+}
+
+def _mix(value: str) -> Tuple[float, ...]:
+    weights = tuple(float(v) for v in value.split(":"))
+    if len(weights) != len(OPS):
+        raise argparse.ArgumentTypeError("expected create:update:delete:read weights")
+    return weights
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "_crash_child":
+        crash_child(sys.argv[2], sys.argv[3], int(sys.argv[4]), (3, 5, 2, 1))
+        sys.exit(0)
+
+    parser = argparse.ArgumentParser(description="Stress the storage layer and API and check consistency.")
+    parser.add_argument("modes", nargs="*", metavar="mode", help=f"any of {', '.join(MODES)} (default: all)")
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--ops", type=int, default=100, help="operations per worker")
+    parser.add_argument("--mix", type=_mix, default=(3, 5, 2, 5), help="create:update:delete:read weights")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--format", choices=["json", "snap"], default="json")
+    parser.add_argument("--rounds", type=int, default=10, help="crash mode: number of kills")
+    parser.add_argument("--baseline", type=int, default=2000, help="crash mode: tasks present before writing")
+    parser.add_argument("--url", help="async mode: stress a running server instead of the app in-process")
+    args = parser.parse_args()
+    unknown = set(args.modes) - set(MODES)
+    if unknown:
+        parser.error(f"unknown mode: {', '.join(sorted(unknown))}")
+
+    failed = False
+    with tempfile.TemporaryDirectory() as workdir:
+        for mode in args.modes or MODES:
+            path = os.path.join(workdir, mode, f"tasks.{args.format}")
+            os.makedirs(os.path.dirname(path))
+            result = MODES[mode](path, args)
+            print(result.report())
+            for name, found in result.violations.items():
+                for item in found[:5]:
+                    print(f"  {name}: {item}")
+            failed = failed or not result.ok()
+    sys.exit(1 if failed else 0)
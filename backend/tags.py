@@ -0,0 +1,36 @@
+from typing import Dict, Iterable, Optional, Set
+from models import Task
+from pmap import PMap, PSet
+
+class TagIndex:
+    """Inverted index from tag to the ids of the live tasks carrying it."""
+
+    def __init__(self):
+        self.tasks_by_tag = PMap()
+
+    def on_change(self, old: Optional[Task], new: Optional[Task]):
+        if old is not None:
+            for tag in old.tags:
+                task_ids = self.tasks_by_tag.get(tag).discard(old.id)
+                if task_ids:
+                    self.tasks_by_tag = self.tasks_by_tag.set(tag, task_ids)
+                else:
+                    self.tasks_by_tag = self.tasks_by_tag.remove(tag)
+        if new is not None:
+            for tag in new.tags:
+                task_ids = self.tasks_by_tag.get(tag, PSet()).add(new.id)
+                self.tasks_by_tag = self.tasks_by_tag.set(tag, task_ids)
+
+    def counts(self) -> Dict[str, int]:
+        counts = {tag: len(task_ids) for tag, task_ids in self.tasks_by_tag.items()}
+        return dict(sorted(counts.items(), key=lambda item: (-item[1], item[0])))
+
+    def query(self, tags: Iterable[str], match_all: bool = True) -> Set[str]:
+        sets = [self.tasks_by_tag.get(tag, PSet()) for tag in set(tags)]
+        if not sets:
+            return set()
+        if match_all:
+            # Walk the smallest posting set and probe the others.
+            sets.sort(key=len)
+            return {t for t in sets[0] if all(t in s for s in sets[1:])}
+        return set().union(*sets)
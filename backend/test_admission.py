@@ -0,0 +1,105 @@
+import asyncio
+import os
+import sys
+import tempfile
+import admission
+
+def check(condition, message):
+    if not condition:
+        print(message)
+        sys.exit(1)
+
+def test_token_bucket():
+    for store in (admission.MemoryBucketStore(), admission.FileBucketStore(os.path.join(tempfile.mkdtemp(), "buckets"))):
+        waits = [store.take("a", 2.0, 3.0, 100.0) for _ in range(4)]
+        check(waits == [0.0, 0.0, 0.0, 0.5], f"Burst not honoured by {type(store).__name__}: {waits}")
+        check(store.take("b", 2.0, 3.0, 100.0) == 0.0, "Clients share a bucket")
+        check(store.take("a", 2.0, 3.0, 100.5) == 0.0, "Bucket did not refill")
+        check(store.take("a", 2.0, 3.0, 1000.0) == 0.0 and store.take("a", 2.0, 3.0, 1000.0) == 0.0, "Refill lost")
+    print("Checked token buckets")
+
+def test_shared_file_buckets():
+    # Workers sharing the state file draw from the same bucket.
+    path = os.path.join(tempfile.mkdtemp(), "buckets")
+    first, second = admission.FileBucketStore(path), admission.FileBucketStore(path)
+    check(first.take("a", 1.0, 1.0, 50.0) == 0.0, "First token refused")
+    check(second.take("a", 1.0, 1.0, 50.0) == 1.0, "Workers do not share buckets")
+    print("Checked shared buckets")
+
+class Responses:
+    def __init__(self):
+        self.messages = []
+
+    async def send(self, message):
+        self.messages.append(message)
+
+    @property
+    def status(self):
+        return self.messages[0]["status"]
+
+    @property
+    def retry_after(self):
+        return dict(self.messages[0]["headers"]).get(b"retry-after")
+
+def request(method: str = "GET", client: str = "1.2.3.4", headers=()):
+    return {"type": "http", "method": method, "client": (client, 1234), "headers": list(headers)}
+
+async def ok_app(scope, receive, send):
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": b""})
+
+async def call(control, scope) -> Responses:
+    responses = Responses()
+    await control(scope, None, responses.send)
+    return responses
+
+def test_rate_limit():
+    async def run():
+        unlimited = admission.AdmissionControl(ok_app)
+        statuses = [(await call(unlimited, request())).status for _ in range(500)]
+        check(set(statuses) == {200}, "Requests limited without a rate set")
+
+        limited = admission.AdmissionControl(ok_app, rate=0.5, burst=2)
+        statuses = [(await call(limited, request())).status for _ in range(2)]
+        rejected = await call(limited, request())
+        check(statuses == [200, 200] and rejected.status == 429, "Empty bucket did not return 429")
+        check(rejected.retry_after == b"2", f"Wrong Retry-After: {rejected.retry_after}")
+        check((await call(limited, request(client="5.6.7.8"))).status == 200, "Other client was limited")
+
+    asyncio.run(run())
+    print("Checked rate limiting")
+
+def test_shedding():
+    async def run():
+        release = asyncio.Event()
+
+        async def slow_app(scope, receive, send):
+            if scope["method"] == "POST":
+                await release.wait()
+            await ok_app(scope, receive, send)
+
+        control = admission.AdmissionControl(slow_app, max_concurrent_writes=1, max_write_queue=1, write_timeout=0.2)
+        holder = asyncio.create_task(call(control, request("POST")))
+        queued = asyncio.create_task(call(control, request("POST")))
+        await asyncio.sleep(0.01)
+        # The slot is held and the queue is full: shed at once.
+        shed = await call(control, request("POST"))
+        check(shed.status == 503 and shed.retry_after is not None, "Full queue did not shed with Retry-After")
+        # Reads never wait for a write slot.
+        check((await call(control, request("GET"))).status == 200, "Read waited for a write slot")
+        # The queued write times out behind the held slot.
+        check((await queued).status == 503, "Queued write did not time out")
+        release.set()
+        check((await holder).status == 200, "Admitted write failed")
+        quick = await call(control, request("POST", headers=[(b"x-request-timeout", b"0")]))
+        check(quick.status == 200, "Free slot refused")
+
+    asyncio.run(run())
+    print("Checked load shedding")
+
+if __name__ == "__main__":
+    test_token_bucket()
+    test_shared_file_buckets()
+    test_rate_limit()
+    test_shedding()
+    print("Admission Verified Successfully!")
@@ -1,6 +1,9 @@
 import requests
 import sys
+from datetime import date, timedelta
 
+# Expects a server without per-client rate limiting (TODO_RATE_LIMIT unset,
+# the default); this script makes a few hundred requests in quick succession.
 BASE_URL = "http://localhost:8000"
 
 def test_api():
@@ -38,6 +41,17 @@ def test_api():
         sys.exit(1)
     print("Updated task")
 
+    # 3b. Task History
+    res = requests.get(f"{BASE_URL}/tasks/{task_id}/history")
+    if res.status_code != 200 or len(res.json()) < 2:
+        print("Task history missing revisions")
+        sys.exit(1)
+    res = requests.get(f"{BASE_URL}/tasks/{task_id}/history/0")
+    if res.status_code != 200 or res.json()['title'] != "Test Task":
+        print("Failed to reconstruct original task")
+        sys.exit(1)
+    print("Checked task history")
+
     # 4. Delete Task
     res = requests.delete(f"{BASE_URL}/tasks/{task_id}")
     if res.status_code != 200:
@@ -45,6 +59,172 @@ def test_api():
         sys.exit(1)
     print("Deleted task")
 
+    # 5. Restore Task from trash
+    res = requests.get(f"{BASE_URL}/trash")
+    if task_id not in [t['id'] for t in res.json()]:
+        print("Deleted task not found in trash")
+        sys.exit(1)
+    res = requests.post(f"{BASE_URL}/trash/{task_id}/restore")
+    if res.status_code != 200:
+        print("Failed to restore task")
+        sys.exit(1)
+    requests.delete(f"{BASE_URL}/tasks/{task_id}")
+    print("Restored task")
+
+    # 6. Subtasks, dependencies and cycles
+    x = requests.post(f"{BASE_URL}/tasks", json={"title": "Graph X"}).json()
+    b = requests.post(f"{BASE_URL}/tasks", json={"title": "Graph B", "parent_id": x['id']}).json()
+    a = requests.post(f"{BASE_URL}/tasks", json={"title": "Graph A", "parent_id": b['id'], "completed": True}).json()
+    res = requests.get(f"{BASE_URL}/tasks/{x['id']}/subtree")
+    if res.status_code != 200 or (res.json()['subtasks_total'], res.json()['subtasks_completed']) != (2, 1):
+        print(f"Wrong subtask roll-up: {res.text}")
+        sys.exit(1)
+    res = requests.put(f"{BASE_URL}/tasks/{x['id']}", json={"title": "Graph X", "parent_id": a['id']})
+    if res.status_code != 400:
+        print("Parent cycle was not rejected")
+        sys.exit(1)
+    d = requests.post(f"{BASE_URL}/tasks", json={"title": "Graph D", "depends_on": [b['id']]}).json()
+    ready = [t['id'] for t in requests.get(f"{BASE_URL}/tasks/ready").json()]
+    if d['id'] in ready or b['id'] not in ready:
+        print("Ready set ignores dependencies")
+        sys.exit(1)
+    # Restoring B would close X -> A -> B -> X through the trash.
+    requests.delete(f"{BASE_URL}/tasks/{b['id']}")
+    res = requests.put(f"{BASE_URL}/tasks/{x['id']}", json={"title": "Graph X", "parent_id": a['id']})
+    if res.status_code != 200:
+        print("Failed to reparent task")
+        sys.exit(1)
+    res = requests.post(f"{BASE_URL}/trash/{b['id']}/restore")
+    if res.status_code != 400:
+        print("Restore closing a parent cycle was not rejected")
+        sys.exit(1)
+    for t in (x, a, d):
+        requests.delete(f"{BASE_URL}/tasks/{t['id']}")
+    print("Checked subtasks and cycles")
+
+    # 6b. A task whose parent and dependency are in the trash can still be edited
+    p = requests.post(f"{BASE_URL}/tasks", json={"title": "Parent P"}).json()
+    q = requests.post(f"{BASE_URL}/tasks", json={"title": "Dependency Q"}).json()
+    c = requests.post(f"{BASE_URL}/tasks", json={"title": "Child C", "parent_id": p['id'], "depends_on": [q['id']]}).json()
+    requests.delete(f"{BASE_URL}/tasks/{p['id']}")
+    requests.delete(f"{BASE_URL}/tasks/{q['id']}")
+    res = requests.put(f"{BASE_URL}/tasks/{c['id']}", json={**c, "completed": True})
+    if res.status_code != 200:
+        print(f"Failed to toggle a task whose parent was deleted: {res.text}")
+        sys.exit(1)
+    res = requests.put(f"{BASE_URL}/tasks/{c['id']}", json={**c, "depends_on": [q['id'], p['id']]})
+    if res.status_code != 400:
+        print("New link to a deleted task was not rejected")
+        sys.exit(1)
+    requests.delete(f"{BASE_URL}/tasks/{c['id']}")
+    print("Checked editing with deleted links")
+
+    # 7. Tags
+    t1 = requests.post(f"{BASE_URL}/tasks", json={"title": "Tagged 1", "tags": ["api-a", "api-b"]}).json()
+    t2 = requests.post(f"{BASE_URL}/tasks", json={"title": "Tagged 2", "tags": ["api-b"]}).json()
+    res = requests.get(f"{BASE_URL}/tasks", params={"tag": ["api-a", "api-b"]})
+    if [t['id'] for t in res.json()] != [t1['id']]:
+        print(f"Wrong tasks for all tags: {res.text}")
+        sys.exit(1)
+    res = requests.get(f"{BASE_URL}/tasks", params={"tag": ["api-a", "api-b"], "match": "any"})
+    if sorted(t['id'] for t in res.json()) != sorted([t1['id'], t2['id']]):
+        print(f"Wrong tasks for any tag: {res.text}")
+        sys.exit(1)
+    counts = requests.get(f"{BASE_URL}/tags").json()
+    if counts.get("api-a") != 1 or counts.get("api-b") != 2:
+        print(f"Wrong tag counts: {counts}")
+        sys.exit(1)
+    for t in (t1, t2):
+        requests.delete(f"{BASE_URL}/tasks/{t['id']}")
+    print("Checked tags")
+
+    # 8. Every field round-trips
+    dep = requests.post(f"{BASE_URL}/tasks", json={"title": "Dependency"}).json()
+    full_data = {
+        "title": "Full Task",
+        "description": "All fields set",
+        "priority": "High",
+        "category": "Study",
+        "due_date": "2030-01-31",
+        "completed": True,
+        "depends_on": [dep['id']],
+        "tags": ["api-x", "api-y"],
+    }
+    full = requests.post(f"{BASE_URL}/tasks", json=full_data).json()
+    res = requests.get(f"{BASE_URL}/tasks/{full['id']}")
+    if {k: res.json().get(k) for k in full_data} != full_data:
+        print(f"Task did not round-trip: {res.text}")
+        sys.exit(1)
+    res = requests.post(f"{BASE_URL}/tasks", json={"title": "Bad Tag", "tags": ["a\x1fb"]})
+    if res.status_code != 422:
+        print("Tag with a control character was not rejected")
+        sys.exit(1)
+    for t in (full, dep):
+        requests.delete(f"{BASE_URL}/tasks/{t['id']}")
+    print("Checked round trip")
+
+    # 9. Saved views
+    soon = (date.today() + timedelta(days=2)).isoformat()
+    later = (date.today() + timedelta(days=30)).isoformat()
+    v1 = requests.post(f"{BASE_URL}/tasks", json={"title": "View 1", "priority": "Low", "due_date": soon, "tags": ["api-view"]}).json()
+    v2 = requests.post(f"{BASE_URL}/tasks", json={"title": "View 2", "priority": "High", "due_date": later, "tags": ["api-view"]}).json()
+    v3 = requests.post(f"{BASE_URL}/tasks", json={"title": "View 3", "priority": "Medium", "tags": ["api-view"]}).json()
+    definition = {"filter": {"tags": ["api-view"], "completed": False}, "sort": "priority"}
+    res = requests.put(f"{BASE_URL}/views/api-view", json=definition)
+    if res.status_code != 200 or res.json()['count'] != 3:
+        print(f"Failed to save view: {res.text}")
+        sys.exit(1)
+    res = requests.get(f"{BASE_URL}/views/api-view")
+    if [t['id'] for t in res.json()] != [v2['id'], v3['id'], v1['id']]:
+        print(f"View is not sorted by priority: {res.text}")
+        sys.exit(1)
+    res = requests.get(f"{BASE_URL}/views/api-view", params={"offset": 1, "limit": 1})
+    if [t['id'] for t in res.json()] != [v3['id']]:
+        print(f"Wrong view page: {res.text}")
+        sys.exit(1)
+    # Completing a task takes it out of the view without re-saving it.
+    requests.put(f"{BASE_URL}/tasks/{v2['id']}", json={**v2, "completed": True})
+    res = requests.get(f"{BASE_URL}/views/api-view", params={"limit": 1})
+    if [t['id'] for t in res.json()] != [v3['id']]:
+        print(f"View did not follow a task update: {res.text}")
+        sys.exit(1)
+    definition = {"filter": {"tags": ["api-view"], "due_within_days": 7}, "sort": "due_date", "descending": True}
+    requests.put(f"{BASE_URL}/views/api-view", json=definition)
+    res = requests.get(f"{BASE_URL}/views/api-view")
+    if [t['id'] for t in res.json()] != [v1['id']]:
+        print(f"Wrong tasks for a due window: {res.text}")
+        sys.exit(1)
+    requests.delete(f"{BASE_URL}/views/api-view")
+    res = requests.get(f"{BASE_URL}/views/api-view")
+    if res.status_code != 404:
+        print("Deleted view still served")
+        sys.exit(1)
+    for t in (v1, v2, v3):
+        requests.delete(f"{BASE_URL}/tasks/{t['id']}")
+    print("Checked views")
+
+    # 10. Agenda
+    a1 = requests.post(f"{BASE_URL}/tasks", json={"title": "Agenda 1", "due_date": "2031-03-05"}).json()
+    a2 = requests.post(f"{BASE_URL}/tasks", json={"title": "Agenda 2", "due_date": "2031-03-06"}).json()
+    a3 = requests.post(f"{BASE_URL}/tasks", json={"title": "Agenda 3", "due_date": "2031-03-12"}).json()
+    a4 = requests.post(f"{BASE_URL}/tasks", json={"title": "Agenda 4"}).json()
+    ours = {a1['id'], a2['id'], a3['id']}
+    res = requests.get(f"{BASE_URL}/tasks/agenda", params={"from": "2031-03-01", "to": "2031-03-31", "group": "week", "include_undated": True})
+    buckets = [(b['start'], [t['id'] for t in b['tasks'] if t['id'] in ours]) for b in res.json()['buckets']]
+    if [b for b in buckets if b[1]] != [("2031-03-03", [a1['id'], a2['id']]), ("2031-03-10", [a3['id']])]:
+        print(f"Wrong agenda weeks: {res.text}")
+        sys.exit(1)
+    if a4['id'] not in [t['id'] for t in res.json()['undated']]:
+        print("Undated task missing from agenda")
+        sys.exit(1)
+    res = requests.get(f"{BASE_URL}/tasks/agenda", params={"from": "2031-03-06", "to": "2031-03-06"})
+    if [t['id'] for b in res.json()['buckets'] for t in b['tasks'] if t['id'] in ours] != [a2['id']]:
+        print(f"Wrong agenda day: {res.text}")
+        sys.exit(1)
+    for t in (a1, a2, a3, a4):
+        requests.delete(f"{BASE_URL}/tasks/{t['id']}")
+    print("Checked agenda")
+
     print("API Verified Successfully!")
 
 if __name__ == "__main__":
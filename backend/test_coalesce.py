@@ -0,0 +1,102 @@
+import asyncio
+import sys
+from coalesce import SingleFlight
+
+def check(condition, message):
+    if not condition:
+        print(message)
+        sys.exit(1)
+
+class Computation:
+    # Counts its runs and holds each one until released.
+    def __init__(self, result: bytes = b"body", error: Exception = None):
+        self.result = result
+        self.error = error
+        self.runs = 0
+        self.release = asyncio.Event()
+
+    async def __call__(self) -> bytes:
+        self.runs += 1
+        await self.release.wait()
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+async def started():
+    # Lets the tasks reach their await on the shared computation.
+    for _ in range(3):
+        await asyncio.sleep(0)
+
+def test_shared():
+    async def run():
+        flight, compute, other = SingleFlight(), Computation(), Computation(b"other")
+        waiters = [flight.do("k", compute) for _ in range(5)]
+        compute.release.set()
+        other.release.set()
+        results = await asyncio.gather(*waiters, flight.do("other", other))
+        check(results == [b"body"] * 5 + [b"other"], f"Wrong results: {results}")
+        check(compute.runs == 1 and other.runs == 1, f"Followers did not share: {compute.runs} runs")
+        stats = flight.stats()
+        check((stats["hits"], stats["misses"]) == (4, 2), f"Wrong counts: {stats}")
+        check(stats["in_flight"] == 0 and stats["hit_rate"] == 4 / 6, f"Wrong stats: {stats}")
+        # Nothing is cached once the computation completes.
+        again = Computation(b"again")
+        again.release.set()
+        check(await flight.do("k", again) == b"again" and again.runs == 1, "Result was cached")
+        check(flight.stats()["misses"] == 3, "Fresh computation not counted as a miss")
+
+    asyncio.run(run())
+    print("Checked shared computation")
+
+def test_cancelled_leader():
+    async def run():
+        flight, compute = SingleFlight(), Computation()
+        leader = asyncio.create_task(flight.do("k", compute))
+        await started()
+        followers = [asyncio.create_task(flight.do("k", compute)) for _ in range(3)]
+        await started()
+        leader.cancel()
+        await started()
+        compute.release.set()
+        results = await asyncio.gather(leader, *followers, return_exceptions=True)
+        check(isinstance(results[0], asyncio.CancelledError), "Leader was not cancelled")
+        check(results[1:] == [b"body"] * 3 and compute.runs == 1, f"Followers lost the shared result: {results[1:]}")
+
+    asyncio.run(run())
+    print("Checked cancelled leader")
+
+def test_cancelled_computation():
+    async def run():
+        # If the shared work itself is cancelled, waiters start it again.
+        flight, compute = SingleFlight(), Computation()
+        waiters = [asyncio.create_task(flight.do("k", compute)) for _ in range(3)]
+        await started()
+        flight._in_flight["k"].cancel()
+        await started()
+        compute.release.set()
+        results = await asyncio.gather(*waiters)
+        check(results == [b"body"] * 3 and compute.runs == 2, f"Waiters did not retry: {results}, {compute.runs} runs")
+
+    asyncio.run(run())
+    print("Checked cancelled computation")
+
+def test_exception():
+    async def run():
+        error = ValueError("boom")
+        flight, compute = SingleFlight(), Computation(error=error)
+        waiters = [asyncio.create_task(flight.do("k", compute)) for _ in range(4)]
+        await started()
+        compute.release.set()
+        results = await asyncio.gather(*waiters, return_exceptions=True)
+        check(all(result is error for result in results), f"Exception did not reach every waiter: {results}")
+        check(compute.runs == 1 and flight.stats()["in_flight"] == 0, "Failed computation left behind")
+
+    asyncio.run(run())
+    print("Checked exceptions")
+
+if __name__ == "__main__":
+    test_shared()
+    test_cancelled_leader()
+    test_cancelled_computation()
+    test_exception()
+    print("Coalescing Verified Successfully!")
@@ -0,0 +1,60 @@
+import os
+import pstats
+import sys
+import tempfile
+
+# Profiling is configured from the environment when the app is imported.
+workdir = tempfile.mkdtemp()
+os.environ["TODO_ADMIN_TOKEN"] = "test-token"
+os.environ["TODO_PROFILE_DIR"] = os.path.join(workdir, "profiles")
+os.environ["TODO_DB_FILE"] = os.path.join(workdir, "tasks.json")
+
+from fastapi.testclient import TestClient
+import generate
+import main
+import profiling
+
+def check(condition, message):
+    if not condition:
+        print(message)
+        sys.exit(1)
+
+def profile(client, fmt: str) -> str:
+    before = set(os.listdir(profiling.PROFILE_DIR)) if os.path.isdir(profiling.PROFILE_DIR) else set()
+    res = client.get("/tasks", headers={"X-Profile": fmt, "X-Admin-Token": "test-token"})
+    check(res.status_code == 200, f"Profiled request failed: {res.status_code}")
+    written = set(os.listdir(profiling.PROFILE_DIR)) - before
+    check(len(written) == 1, f"Expected one {fmt} profile, found {sorted(written)}")
+    return os.path.join(profiling.PROFILE_DIR, written.pop())
+
+def test_pstats_profile(client):
+    # The list is loaded and encoded in the threadpool; the profile covers it.
+    path = profile(client, "pstats")
+    check(path.endswith(".prof"), f"Wrong profile name: {path}")
+    functions = {name for _, _, name in pstats.Stats(path).stats}
+    for name in ("encode", "get_tasks", "dump_json"):
+        check(name in functions, f"{name} missing from the profile")
+    print("Checked pstats profile")
+
+def test_collapsed_profile(client):
+    path = profile(client, "collapsed")
+    check(path.endswith(".collapsed"), f"Wrong profile name: {path}")
+    with open(path) as f:
+        stacks = f.read()
+    check("main.py:encode" in stacks, "Threadpool work missing from the sampled stacks")
+    print("Checked collapsed profile")
+
+def test_unprofiled(client):
+    before = os.listdir(profiling.PROFILE_DIR)
+    check(client.get("/tasks", headers={"X-Profile": "pstats"}).status_code == 200, "Request without a token failed")
+    check(os.listdir(profiling.PROFILE_DIR) == before, "Profiled without an admin token")
+    print("Checked requests without a token")
+
+if __name__ == "__main__":
+    # Big enough that encoding spans many sampler ticks.
+    generate.write_dataset(os.environ["TODO_DB_FILE"], 20000)
+    with TestClient(main.app) as client:
+        test_pstats_profile(client)
+        test_collapsed_profile(client)
+        test_unprofiled(client)
+    print("Profiling Verified Successfully!")
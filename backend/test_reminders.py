@@ -0,0 +1,135 @@
+import asyncio
+import os
+import sys
+import tempfile
+from datetime import date, datetime
+from models import Task
+import reminders
+
+def check(condition, message):
+    if not condition:
+        print(message)
+        sys.exit(1)
+
+class Clock:
+    def __init__(self, now: datetime):
+        self.now = now
+
+    def __call__(self) -> datetime:
+        return self.now
+
+def task(task_id: str, due: date = None, completed: bool = False, title: str = "t") -> Task:
+    return Task(id=task_id, title=title, due_date=due, completed=completed)
+
+def ids(tasks):
+    return sorted(t.id for t in tasks)
+
+def test_changes():
+    scheduler = reminders.OverdueScheduler(clock=Clock(datetime(2030, 1, 1)))
+    a, b, c = task("a", date(2030, 1, 2)), task("b", date(2030, 1, 3)), task("c")
+    for t in (a, b, c):
+        scheduler.on_change(None, t)
+    check(scheduler.next_deadline() == datetime(2030, 1, 3), "Wrong next deadline")
+    check(scheduler.pop_due(datetime(2030, 1, 2, 23)) == [], "Fired before the due date passed")
+
+    # Moving a due date leaves a superseded heap entry that must not fire.
+    moved = task("a", date(2030, 1, 5))
+    scheduler.on_change(a, moved)
+    check(scheduler.next_deadline() == datetime(2030, 1, 4), "Superseded deadline not skipped")
+    check(ids(scheduler.pop_due(datetime(2030, 1, 4))) == ["b"], "Wrong tasks fired")
+    check(ids(scheduler.overdue.values()) == ["b"], "Fired task not recorded as overdue")
+
+    # An edit that keeps the due date does not notify again.
+    renamed = task("b", date(2030, 1, 3), title="renamed")
+    scheduler.on_change(task("b", date(2030, 1, 3)), renamed)
+    check(scheduler.overdue["b"].title == "renamed", "Overdue task not refreshed")
+    check(scheduler.pop_due(datetime(2030, 1, 4)) == [], "Refreshed task fired again")
+
+    # Completing or deleting takes a task out, overdue or not.
+    scheduler.on_change(renamed, task("b", date(2030, 1, 3), completed=True))
+    scheduler.on_change(moved, None)
+    check(scheduler.overdue == {} and scheduler.next_deadline() is None, "Completed or deleted task kept")
+    check(scheduler.pop_due(datetime(2031, 1, 1)) == [], "Deleted task fired")
+
+    # Reopening a completed task schedules it again.
+    scheduler.on_change(None, task("b", date(2030, 1, 3)))
+    check(ids(scheduler.pop_due(datetime(2030, 1, 5))) == ["b"], "Reopened task not fired")
+    print("Checked scheduler changes")
+
+def test_compaction():
+    scheduler = reminders.OverdueScheduler(clock=Clock(datetime(2030, 1, 1)))
+    current = task("a", date(2030, 2, 1))
+    scheduler.on_change(None, current)
+    for day in range(2, 29):
+        for _ in range(10):
+            moved = task("a", date(2030, 2, day))
+            scheduler.on_change(current, moved)
+            current = moved
+    check(len(scheduler._heap) <= 2 * len(scheduler._deadlines) + 64, f"Heap not compacted: {len(scheduler._heap)}")
+    check(scheduler.next_deadline() == datetime(2030, 3, 1), "Compaction lost the deadline")
+    check(ids(scheduler.pop_due(datetime(2030, 3, 1))) == ["a"], "Compacted task did not fire once")
+    print("Checked heap compaction")
+
+def test_seed():
+    overdue, missed, upcoming = task("old", date(2030, 1, 1)), task("missed", date(2030, 1, 5)), task("new", date(2030, 2, 1))
+
+    # Without a record of an earlier run, nothing already overdue fires.
+    scheduler = reminders.OverdueScheduler(clock=Clock(datetime(2030, 1, 10)))
+    for t in (overdue, missed, upcoming):
+        scheduler.seed(t)
+    check(ids(scheduler.overdue.values()) == ["missed", "old"], "Overdue tasks not recorded")
+    check(scheduler.pop_due(datetime(2030, 1, 10)) == [], "Seeded overdue task fired")
+
+    # An earlier run checked through Jan 3: only what fell due since fires.
+    state_file = os.path.join(tempfile.mkdtemp(), "tasks.reminders.json")
+    reminders.save_checked_through(state_file, datetime(2030, 1, 3))
+    scheduler = reminders.OverdueScheduler(clock=Clock(datetime(2030, 1, 10)))
+    scheduler.restore(state_file)
+    for t in (overdue, missed, upcoming):
+        scheduler.seed(t)
+    check(ids(scheduler.pop_due(datetime(2030, 1, 10))) == ["missed"], "Deadline missed while down not fired")
+
+    # A task changed while seeding is not recorded as overdue twice.
+    scheduler.on_change(None, upcoming)
+    scheduler.seed(upcoming)
+    check(scheduler.next_deadline() == datetime(2030, 2, 2), "Known task reseeded")
+    print("Checked seeding")
+
+def test_checked_through():
+    path = os.path.join(tempfile.mkdtemp(), "tasks.reminders.json")
+    check(reminders.load_checked_through(path) is None, "Missing state file read")
+    reminders.save_checked_through(path, datetime(2030, 1, 3, 12, 30))
+    check(reminders.load_checked_through(path) == datetime(2030, 1, 3, 12, 30), "State did not round-trip")
+    with open(path, "w") as f:
+        f.write("{")
+    check(reminders.load_checked_through(path) is None, "Corrupt state file read")
+    print("Checked saved state")
+
+def test_run():
+    # The loop notifies what is due, then records how far it checked.
+    state_file = os.path.join(tempfile.mkdtemp(), "tasks.reminders.json")
+    notified = []
+    scheduler = reminders.OverdueScheduler(notifier=notified.append, clock=Clock(datetime(2030, 1, 10)))
+    scheduler.restore(state_file)
+    scheduler.on_change(None, task("a", date(2030, 1, 5)))
+
+    async def run():
+        runner = asyncio.create_task(scheduler.run())
+        for _ in range(100):
+            await asyncio.sleep(0.01)
+            if os.path.exists(state_file):
+                break
+        runner.cancel()
+
+    asyncio.run(run())
+    check(ids(notified) == ["a"], f"Wrong notifications: {notified}")
+    check(reminders.load_checked_through(state_file) == datetime(2030, 1, 10), "Checked time not saved")
+    print("Checked scheduler loop")
+
+if __name__ == "__main__":
+    test_changes()
+    test_compaction()
+    test_seed()
+    test_checked_through()
+    test_run()
+    print("Reminders Verified Successfully!")
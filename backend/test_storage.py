@@ -0,0 +1,208 @@
+import os
+import random
+import subprocess
+import sys
+import tempfile
+from datetime import date, datetime, timedelta, timezone
+from models import Category, Priority, Task, TaskCreate, ViewDefinition, ViewFilter
+from pmap import PMap, PSet, PSortedList
+import database
+import generate
+import history
+import snapshot
+from views import PRIORITY_RANK, ViewIndex
+
+class CollidingKey:
+    # Few distinct hashes, to exercise collision leaves.
+    def __init__(self, n):
+        self.n = n
+
+    def __hash__(self):
+        return self.n % 3
+
+    def __eq__(self, other):
+        return isinstance(other, CollidingKey) and other.n == self.n
+
+def check(condition, message):
+    if not condition:
+        print(message)
+        sys.exit(1)
+
+def test_pmap():
+    rng = random.Random(7)
+    for make_key in (lambda n: n, str, CollidingKey):
+        m, model, history = PMap(), {}, []
+        for _ in range(3000):
+            n = rng.randrange(400)
+            if rng.random() < 0.6:
+                m = m.set(make_key(n), n)
+                model[n] = n
+            else:
+                m = m.remove(make_key(n))
+                model.pop(n, None)
+            history.append((m, dict(model)))
+        # Every earlier map still holds exactly what it held when it was made.
+        for old, expected in history[::97]:
+            check(len(old) == len(expected), "PMap length drifted")
+            check(sorted(v for _, v in old.items()) == sorted(expected.values()), "PMap items drifted")
+            for n in range(400):
+                check(old.get(make_key(n)) == expected.get(n), f"PMap lookup of {n} is wrong")
+    check(PMap().remove("missing").get("missing") is None, "Removing a missing key failed")
+    print("Checked PMap")
+
+def test_pset():
+    s = PSet(["a", "b"])
+    t = s.add("c").discard("a")
+    check(sorted(s) == ["a", "b"] and sorted(t) == ["b", "c"], "PSet changed in place")
+    check(len(t) == 2 and "c" in t and "a" not in t, "PSet membership is wrong")
+    print("Checked PSet")
+
+def test_sorted_list():
+    rng = random.Random(11)
+    lst, model = PSortedList(), []
+    for _ in range(5000):
+        n = rng.randrange(2000)
+        if n in model:
+            before = lst
+            lst = lst.remove(n)
+            model.remove(n)
+            check(n in list(before), "PSortedList changed in place")
+        else:
+            lst = lst.add(n)
+            model.append(n)
+            model.sort()
+    check(list(lst) == model and len(lst) == len(model), "PSortedList out of order")
+    check(list(reversed(lst)) == model[::-1], "PSortedList reversed out of order")
+    check(list(lst.irange(500, 900)) == [n for n in model if 500 <= n <= 900], "PSortedList range is wrong")
+    check(list(lst.irange(500, 900, reverse=True)) == [n for n in model if 500 <= n <= 900][::-1],
+          "PSortedList reversed range is wrong")
+    check(list(lst.irange(-1, 5000, reverse=True)) == model[::-1], "PSortedList full reversed range is wrong")
+    check(list(PSortedList().irange(0, 1, reverse=True)) == [], "Empty PSortedList range is wrong")
+    for n in (-1, 0, 700, 1999, 5000):
+        check(lst.bisect_left(n) == sum(1 for m in model if m < n), f"PSortedList.bisect_left({n}) is wrong")
+    check(list(PSortedList.from_sorted(model)) == model, "PSortedList.from_sorted is wrong")
+    print("Checked PSortedList")
+
+def test_view_windows():
+    # Windowed views, read by bisection, match a filter-and-sort of every task.
+    rng = random.Random(5)
+    today = date(2030, 6, 1)
+    definitions = {
+        f"{sort}-{descending}-{days}": ViewDefinition(filter=ViewFilter(due_within_days=days), sort=sort, descending=descending)
+        for sort in ("due_date", "priority", "title") for descending in (False, True) for days in (None, 0, 10)
+    }
+    sort_keys = {
+        "due_date": lambda t: (t.due_date is None, t.due_date or date.min, t.id),
+        "priority": lambda t: (PRIORITY_RANK[t.priority], t.id),
+        "title": lambda t: (t.title.casefold(), t.id),
+    }
+    index, tasks = ViewIndex(definitions), {}
+    for n in range(1500):
+        due = None if rng.random() < 0.2 else today + timedelta(days=rng.randrange(-20, 40))
+        task = Task(id=f"t{rng.randrange(400)}", title=rng.choice("abcde") + str(n), due_date=due,
+                    priority=rng.choice(list(Priority)))
+        old = tasks.pop(task.id, None)
+        if rng.random() < 0.2:
+            index.on_change(old, None)
+        else:
+            index.on_change(old, task)
+            tasks[task.id] = task
+    index.define("late", definitions["title-True-10"], tasks.values())
+    definitions["late"] = definitions["title-True-10"]
+    for name, definition in definitions.items():
+        days = definition.filter.due_within_days
+        expected = [t.id for t in sorted(tasks.values(), key=sort_keys[definition.sort], reverse=definition.descending)
+                    if days is None or (t.due_date is not None and t.due_date <= today + timedelta(days=days))]
+        check(index.view(name, today).count == len(expected), f"Wrong count for view {name}")
+        check(index.ids(name, today) == expected, f"Wrong tasks for view {name}")
+        check(index.ids(name, today, 3, 5) == expected[3:8], f"Wrong page for view {name}")
+    print("Checked view windows")
+
+def test_snapshot_round_trip():
+    tasks = [
+        Task(id="b", title="Minimal"),
+        Task(id="a", title="Full", description="d\u00e9j\u00e0 vu", priority=Priority.high, category=Category.study,
+             due_date=date(2030, 1, 31), completed=True, parent_id="b", depends_on=["b", "c"],
+             tags=["x", "y z"], deleted_at=datetime(2030, 2, 1, 12, 30, tzinfo=timezone.utc)),
+        Task(id="c", title="", tags=["only"]),
+    ]
+    path = os.path.join(tempfile.mkdtemp(), "tasks.snap")
+    snapshot.write(path, tasks)
+    snap = snapshot.Snapshot(path)
+    check(sorted(snap, key=lambda t: t.id) == sorted(tasks, key=lambda t: t.id), "Snapshot did not round-trip")
+    check(snap.task(snap.find("a")) == tasks[1] and snap.find("missing") is None, "Snapshot lookup is wrong")
+    print("Checked snapshot round trip")
+
+def test_generate():
+    # Datasets are reproducible, valid and load the same from either format.
+    anchor = date(2030, 1, 1)
+    tasks = list(generate.generate_tasks(500, seed=3, anchor=anchor))
+    check(tasks == list(generate.generate_tasks(500, seed=3, anchor=anchor)), "Same seed gave different tasks")
+    check(tasks != list(generate.generate_tasks(500, seed=4, anchor=anchor)), "Seed was ignored")
+    check(all(Task(**t.model_dump()) == t for t in tasks), "Generated task fails validation")
+    loaded = {}
+    for ext in ("json", "snap"):
+        database.DB_FILE = os.path.join(tempfile.mkdtemp(), f"tasks.{ext}")
+        ids = generate.write_dataset(database.DB_FILE, 500, seed=3, anchor=anchor)
+        database.reset()
+        loaded[ext] = sorted(database.get_tasks(), key=lambda t: t.id)
+        check(ids == [t.id for t in tasks], "write_dataset returned the wrong ids")
+    check(loaded["json"] == loaded["snap"] == sorted(tasks, key=lambda t: t.id), "Generated dataset did not load")
+    print("Checked generate")
+
+def test_pinned_indexes():
+    # A request pinned before a write keeps reading the indexes of its own version.
+    database.DB_FILE = os.path.join(tempfile.mkdtemp(), "tasks.json")
+    database.reset()
+    a = database.add_task(TaskCreate(title="a", tags=["x"]))
+    b = database.add_task(TaskCreate(title="b"))
+    check([t.id for t in database.get_tasks_by_tags(["x"])] == [a.id], "Tag query is wrong")
+    with database.pin():
+        database.update_task(a.id, TaskCreate(title="a"))
+        database.update_task(b.id, TaskCreate(title="b", tags=["x"]))
+        pinned = database.get_tasks_by_tags(["x"])
+        check([t.id for t in pinned] == [a.id] and pinned[0].tags == ["x"], "Pinned tag query saw a later write")
+        check(database.get_tag_counts() == {"x": 1}, "Pinned tag counts saw a later write")
+    check([t.id for t in database.get_tasks_by_tags(["x"])] == [b.id], "Tag query missed the write")
+    print("Checked pinned indexes")
+
+def test_torn_history():
+    # A torn record from an interrupted append must not hide later revisions.
+    database.DB_FILE = os.path.join(tempfile.mkdtemp(), "tasks.json")
+    database.reset()
+    task = database.add_task(TaskCreate(title="a"))
+    database.update_task(task.id, TaskCreate(title="b"))
+    with open(database.history_file(), "ab") as f:
+        f.write(b'{"task_id": "torn", "re')
+    history.reset()
+    database.update_task(task.id, TaskCreate(title="c"))
+    history.reset()
+    check([r["rev"] for r in history.revisions(task.id)] == [0, 1, 2], "Revisions after a torn line were lost")
+    check(history.reconstruct(task.id, 2).title == "c", "Failed to reconstruct after a torn line")
+    print("Checked torn history")
+
+def test_cross_process_reads():
+    # A write by another process sharing the file is seen without writing here.
+    database.DB_FILE = os.path.join(tempfile.mkdtemp(), "tasks.json")
+    database.reset()
+    check(database.get_tasks() == [], "New file is not empty")
+    script = ("import database\nfrom models import TaskCreate\n"
+              f"database.DB_FILE = {database.DB_FILE!r}\n"
+              "print(database.add_task(TaskCreate(title='other')).id)")
+    task_id = subprocess.check_output([sys.executable, "-c", script], text=True).strip()
+    check(database.get_task(task_id) is not None, "Read missed another process's write")
+    with database.pin():
+        check([t.id for t in database.get_tasks()] == [task_id], "Pinned read missed another process's write")
+    print("Checked cross-process reads")
+
+if __name__ == "__main__":
+    test_pmap()
+    test_pset()
+    test_sorted_list()
+    test_view_windows()
+    test_snapshot_round_trip()
+    test_generate()
+    test_pinned_indexes()
+    test_torn_history()
+    test_cross_process_reads()
+    print("Storage Verified Successfully!")
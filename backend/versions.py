@@ -0,0 +1,140 @@
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+from models import Task
+from pmap import PMap
+import snapshot
+
+_MISSING = object()
+
+class DictBase:
+    """Tasks loaded in full (from tasks.json or a compaction). Never mutated."""
+
+    def __init__(self, tasks: Iterable[Task] = ()):
+        self._tasks: Dict[str, Task] = {t.id: t for t in tasks}
+
+    def __len__(self) -> int:
+        return len(self._tasks)
+
+    def get(self, task_id: str) -> Optional[Task]:
+        return self._tasks.get(task_id)
+
+    def items(self) -> Iterator[Tuple[str, Task]]:
+        return iter(self._tasks.items())
+
+    def ids(self) -> Iterator[str]:
+        return iter(self._tasks)
+
+class SnapshotBase:
+    """Tasks in a memory-mapped snapshot, decoded on first access.
+
+    The file is immutable, so decoded tasks are cached and shared by every
+    version built on it.
+    """
+
+    def __init__(self, snap: snapshot.Snapshot):
+        self._snapshot = snap
+        self._decoded: Dict[int, Task] = {}
+
+    def __len__(self) -> int:
+        return len(self._snapshot)
+
+    def _task(self, i: int) -> Task:
+        task = self._decoded.get(i)
+        if task is None:
+            task = self._decoded[i] = self._snapshot.task(i)
+        return task
+
+    def get(self, task_id: str) -> Optional[Task]:
+        i = self._snapshot.find(task_id)
+        return None if i is None else self._task(i)
+
+    def items(self) -> Iterator[Tuple[str, Task]]:
+        for i in range(len(self._snapshot)):
+            task = self._task(i)
+            yield task.id, task
+
+    def ids(self) -> Iterator[str]:
+        return (self._snapshot.id_at(i) for i in range(len(self._snapshot)))
+
+class Version:
+    """One immutable state of the task store.
+
+    A version is a base plus an overlay of changes made since the base was
+    loaded. The overlay is a persistent map, so publishing a change copies
+    O(log N) nodes and leaves older versions intact for readers still using
+    them. Tasks created since the base are appended to a list shared by every
+    version of that base; each version only looks at its own prefix of it.
+    A None value in the overlay marks a task removed from the store.
+
+    indexes holds the secondary indexes built from exactly this version's
+    tasks, or None until the storage layer builds them.
+    """
+
+    __slots__ = ("number", "indexes", "_base", "_overlay", "_added", "_added_len", "_len")
+
+    def __init__(self, base, number: int = 0, _overlay: PMap = PMap(),
+                 _added: Optional[List[str]] = None, _added_len: int = 0, _len: Optional[int] = None):
+        self.number = number
+        self.indexes = None
+        self._base = base
+        self._overlay = _overlay
+        self._added = [] if _added is None else _added
+        self._added_len = _added_len
+        self._len = len(base) if _len is None else _len
+
+    def __len__(self) -> int:
+        return self._len
+
+    def get(self, task_id: str) -> Optional[Task]:
+        task = self._overlay.get(task_id, _MISSING)
+        if task is _MISSING:
+            return self._base.get(task_id)
+        return task
+
+    def values(self) -> Iterator[Task]:
+        for task_id, task in self._base.items():
+            changed = self._overlay.get(task_id, _MISSING)
+            if changed is _MISSING:
+                yield task
+            elif changed is not None:
+                yield changed
+        for task_id in self._added[:self._added_len]:
+            task = self._overlay.get(task_id)
+            if task is not None:
+                yield task
+
+    def ids(self) -> Iterator[str]:
+        for task_id in self._base.ids():
+            if self._overlay.get(task_id, _MISSING) is not None:
+                yield task_id
+        for task_id in self._added[:self._added_len]:
+            if self._overlay.get(task_id) is not None:
+                yield task_id
+
+    def _derive(self, task_id: str, task: Optional[Task]) -> "Version":
+        # Only valid on the latest version: the shared added list is appended to.
+        existed = self.get(task_id) is not None
+        added_len = self._added_len
+        if task is not None and not existed and task_id not in self._overlay and self._base.get(task_id) is None:
+            self._added.append(task_id)
+            added_len += 1
+        return Version(
+            self._base,
+            self.number + 1,
+            self._overlay.set(task_id, task),
+            self._added,
+            added_len,
+            self._len + (task is not None) - existed,
+        )
+
+    def with_indexes(self, indexes) -> "Version":
+        # The same tasks under the same number, with other indexes; used when
+        # only index state changes, e.g. a saved view.
+        version = Version(self._base, self.number, self._overlay, self._added, self._added_len, self._len)
+        version.indexes = indexes
+        return version
+
+    def put(self, task: Task) -> "Version":
+        return self._derive(task.id, task)
+
+    def remove(self, task_id: str) -> "Version":
+        return self._derive(task_id, None)
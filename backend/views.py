@@ -0,0 +1,141 @@
+import heapq
+import json
+import os
+from datetime import date, timedelta
+from itertools import islice
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+from models import Priority, Task, View, ViewDefinition
+from pmap import PSortedList
+import database
+
+PRIORITY_RANK = {Priority.high: 0, Priority.medium: 1, Priority.low: 2}
+
+def load_definitions() -> Dict[str, ViewDefinition]:
+    if not os.path.exists(database.views_file()):
+        return {}
+    with open(database.views_file(), "r") as f:
+        try:
+            data = json.load(f)
+        except json.JSONDecodeError:
+            return {}
+    return {name: ViewDefinition(**definition) for name, definition in data.items()}
+
+def save_definitions(definitions: Dict[str, ViewDefinition]):
+    tmp_path = database.views_file() + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump({name: d.model_dump(mode="json") for name, d in definitions.items()}, f, indent=4)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, database.views_file())
+
+class ViewIndex:
+    """Materialized results of the saved views over the live tasks."""
+
+    def __init__(self, definitions: Optional[Dict[str, ViewDefinition]] = None):
+        # Each view keeps (sort key, id, due date) entries in sort order, so
+        # reading a view never sorts. Windows relative to today are applied
+        # on read, so the results don't go stale at midnight.
+        self.definitions: Dict[str, ViewDefinition] = dict(definitions or {})
+        self.results: Dict[str, PSortedList] = {name: PSortedList() for name in self.definitions}
+        # (due date, entry) for windowed views not sorted by due date.
+        self.windows: Dict[str, PSortedList] = {
+            name: PSortedList() for name, definition in self.definitions.items() if self._windowed(definition)
+        }
+
+    def on_change(self, old: Optional[Task], new: Optional[Task]):
+        results = dict(self.results)
+        windows = dict(self.windows)
+        for name, definition in self.definitions.items():
+            if old is not None and self._matches(definition, old):
+                entry = self._entry(definition, old)
+                results[name] = results[name].remove(entry)
+                if name in windows:
+                    windows[name] = windows[name].remove((old.due_date, entry))
+            if new is not None and self._matches(definition, new):
+                entry = self._entry(definition, new)
+                results[name] = results[name].add(entry)
+                if name in windows:
+                    windows[name] = windows[name].add((new.due_date, entry))
+        self.results = results
+        self.windows = windows
+
+    def define(self, name: str, definition: ViewDefinition, tasks: Iterable[Task]):
+        entries = sorted(self._entry(definition, t) for t in tasks if self._matches(definition, t))
+        self.definitions = {**self.definitions, name: definition}
+        self.results = {**self.results, name: PSortedList.from_sorted(entries)}
+        windows = {n: w for n, w in self.windows.items() if n != name}
+        if self._windowed(definition):
+            windows[name] = PSortedList.from_sorted(sorted((entry[2], entry) for entry in entries))
+        self.windows = windows
+
+    def remove(self, name: str):
+        self.definitions = {n: d for n, d in self.definitions.items() if n != name}
+        self.results = {n: r for n, r in self.results.items() if n != name}
+        self.windows = {n: w for n, w in self.windows.items() if n != name}
+
+    def view(self, name: str, today: date) -> View:
+        definition = self.definitions[name]
+        end = self._window_end(definition, today)
+        if end is None:
+            count = len(self.results[name])
+        elif name in self.windows:
+            count = self.windows[name].bisect_left((end,))
+        else:
+            count = self.results[name].bisect_left(((False, end),))
+        return View(name=name, count=count, **definition.model_dump())
+
+    def ids(self, name: str, today: date, offset: int = 0, limit: Optional[int] = None) -> List[str]:
+        end = None if limit is None else offset + limit
+        return [task_id for _, task_id, _ in islice(self._entries(name, today, end), offset, end)]
+
+    def _entries(self, name: str, today: date, needed: Optional[int]) -> Iterator[Tuple[tuple, str, Optional[date]]]:
+        # Walk the results backwards instead of keeping a second sorted copy.
+        # The empty tuple sorts before every entry.
+        definition = self.definitions[name]
+        result = self.results[name]
+        end = self._window_end(definition, today)
+        if end is None:
+            return reversed(result) if definition.descending else iter(result)
+        if name not in self.windows:
+            # Sorted by due date, so the window is a prefix of the results.
+            return result.irange((), ((False, end),), reverse=definition.descending)
+        # Only the tasks in the window are sorted, and only the first needed.
+        window = (entry for _, entry in self.windows[name].irange((), (end,)))
+        if needed is None:
+            return iter(sorted(window, reverse=definition.descending))
+        return iter((heapq.nlargest if definition.descending else heapq.nsmallest)(needed, window))
+
+    @staticmethod
+    def _window_end(definition: ViewDefinition, today: date) -> Optional[date]:
+        # First due date past the view's window, if it has one.
+        if definition.filter.due_within_days is None:
+            return None
+        return today + timedelta(days=definition.filter.due_within_days + 1)
+
+    @staticmethod
+    def _windowed(definition: ViewDefinition) -> bool:
+        return definition.filter.due_within_days is not None and definition.sort != "due_date"
+
+    def _matches(self, definition: ViewDefinition, task: Task) -> bool:
+        f = definition.filter
+        if f.completed is not None and task.completed != f.completed:
+            return False
+        if f.priority and task.priority not in f.priority:
+            return False
+        if f.category and task.category not in f.category:
+            return False
+        if f.tags and not set(f.tags).issubset(task.tags):
+            return False
+        if f.due_within_days is not None and task.due_date is None:
+            return False
+        return True
+
+    def _entry(self, definition: ViewDefinition, task: Task) -> Tuple[tuple, str, Optional[date]]:
+        # Ties fall back to the id so every entry has a unique position.
+        if definition.sort == "priority":
+            key = (PRIORITY_RANK[task.priority],)
+        elif definition.sort == "title":
+            key = (task.title.casefold(),)
+        else:
+            key = (task.due_date is None, task.due_date or date.min)
+        return key, task.id, task.due_date
@@ -1,41 +1,34 @@
-import { useEffect, useState } from 'react';
-import { api } from './api';
+import { useCallback, useEffect, useMemo, useState } from 'react';
 import type { Task, TaskCreate } from './api';
 import { TaskItem } from './components/TaskItem';
 import { TaskForm } from './components/TaskForm';
+import { VirtualList } from './components/VirtualList';
+import { isPending, useTaskCache } from './useTaskCache';
 
 type SortOption = 'dueDate' | 'priority';
 type FilterStatus = 'all' | 'completed' | 'pending';
 
+const priorityMap = { High: 0, Medium: 1, Low: 2 };
+
+const getTaskId = (task: Task) => task.id;
+
 function App() {
-  const [tasks, setTasks] = useState<Task[]>([]);
+  const { tasks, isLoading, load, createTask, updateTask, deleteTask } = useTaskCache();
   const [isFormOpen, setIsFormOpen] = useState(false);
   const [editingTask, setEditingTask] = useState<Task | null>(null);
-  const [isLoading, setIsLoading] = useState(true);
 
   const [filterStatus, setFilterStatus] = useState<FilterStatus>('all');
   const [sortOption, setSortOption] = useState<SortOption>('dueDate');
 
   useEffect(() => {
-    loadTasks();
-  }, []);
-
-  const loadTasks = async () => {
-    try {
-      const data = await api.getTasks();
-      setTasks(data);
-    } catch (error) {
-      console.error(error);
-    } finally {
-      setIsLoading(false);
-    }
-  };
+    load().catch(error => console.error(error));
+  }, [load]);
 
+  // Mutations show up immediately and are rolled back if the server rejects them.
   const handleCreateTask = async (taskData: TaskCreate) => {
+    setIsFormOpen(false);
     try {
-      await api.createTask(taskData);
-      await loadTasks();
-      setIsFormOpen(false);
+      await createTask(taskData);
     } catch (error) {
       alert('Failed to create task');
     }
@@ -43,57 +36,62 @@ function App() {
 
   const handleUpdateTask = async (taskData: TaskCreate) => {
     if (!editingTask) return;
+    setEditingTask(null);
+    setIsFormOpen(false);
     try {
-      await api.updateTask(editingTask.id, taskData);
-      await loadTasks();
-      setEditingTask(null);
-      setIsFormOpen(false);
+      await updateTask(editingTask, taskData);
     } catch (error) {
       alert('Failed to update task');
     }
   };
 
-  const handleDeleteTask = async (id: string) => {
+  const handleDeleteTask = useCallback(async (id: string) => {
     try {
-      await api.deleteTask(id);
-      setTasks(tasks.filter(t => t.id !== id));
+      await deleteTask(id);
     } catch (error) {
       alert('Failed to delete task');
     }
-  };
+  }, [deleteTask]);
 
-  const handleToggleComplete = async (task: Task) => {
+  const handleToggleComplete = useCallback(async (task: Task) => {
     try {
-      await api.updateTask(task.id, { ...task, completed: !task.completed });
-      await loadTasks();
+      await updateTask(task, { ...task, completed: !task.completed });
     } catch (error) {
       alert('Failed to update task status');
     }
-  };
+  }, [updateTask]);
 
-  const openEdit = (task: Task) => {
+  const openEdit = useCallback((task: Task) => {
     setEditingTask(task);
     setIsFormOpen(true);
-  };
+  }, []);
 
-  const filteredTasks = tasks
-    .filter(task => {
+  const filteredTasks = useMemo(() => {
+    const visible = tasks.filter(task => {
       if (filterStatus === 'completed') return task.completed;
       if (filterStatus === 'pending') return !task.completed;
       return true;
-    })
-    .sort((a, b) => {
-      if (sortOption === 'dueDate') {
-        if (!a.due_date) return 1;
-        if (!b.due_date) return -1;
-        return new Date(a.due_date).getTime() - new Date(b.due_date).getTime();
-      }
-      if (sortOption === 'priority') {
-        const priorityMap = { High: 0, Medium: 1, Low: 2 };
-        return priorityMap[a.priority] - priorityMap[b.priority];
-      }
-      return 0;
     });
+    // Sort keys are computed once per task rather than on every comparison.
+    const keyed = visible.map(task => ({
+      task,
+      key: sortOption === 'priority'
+        ? priorityMap[task.priority]
+        : task.due_date ? new Date(task.due_date).getTime() : Infinity,
+    }));
+    keyed.sort((a, b) => (a.key === b.key ? 0 : a.key < b.key ? -1 : 1));
+    return keyed.map(({ task }) => task);
+  }, [tasks, filterStatus, sortOption]);
+
+  const renderTask = useCallback((task: Task) => (
+    <TaskItem
+      task={task}
+      onToggleComplete={handleToggleComplete}
+      onDelete={handleDeleteTask}
+      onEdit={openEdit}
+      pending={isPending(task)}
+    />
+  ), [handleToggleComplete, handleDeleteTask, openEdit]);
 
   return (
     <div className="container">
@@ -152,15 +150,12 @@ function App() {
             <p>No tasks found. Create one to get started!</p>
           </div>
         ) : (
-          filteredTasks.map(task => (
-            <TaskItem
-              key={task.id}
-              task={task}
-              onToggleComplete={handleToggleComplete}
-              onDelete={handleDeleteTask}
-              onEdit={openEdit}
-            />
-          ))
+          <VirtualList
+            items={filteredTasks}
+            getKey={getTaskId}
+            renderItem={renderTask}
+            estimatedHeight={120}
+          />
         )}
       </div>
     </div>
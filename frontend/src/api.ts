@@ -6,6 +6,9 @@ export interface Task {
   category?: 'Work' | 'Personal' | 'Study';
   due_date?: string;
   completed: boolean;
+  parent_id?: string | null;
+  depends_on?: string[];
+  tags?: string[];
 }
 
 export interface TaskCreate {
@@ -15,10 +18,53 @@ export interface TaskCreate {
   category?: 'Work' | 'Personal' | 'Study';
   due_date?: string;
   completed: boolean;
+  parent_id?: string | null;
+  depends_on?: string[];
+  tags?: string[];
+}
+
+export interface ViewDefinition {
+  filter: {
+    completed?: boolean | null;
+    priority?: Array<'Low' | 'Medium' | 'High'>;
+    category?: Array<'Work' | 'Personal' | 'Study'>;
+    tags?: string[];
+    due_within_days?: number | null;
+  };
+  sort: 'due_date' | 'priority' | 'title';
+  descending?: boolean;
+}
+
+export interface View extends ViewDefinition {
+  name: string;
+  count: number;
+}
+
+export interface AgendaBucket {
+  start: string;
+  end: string;
+  tasks: Task[];
+}
+
+export interface Agenda {
+  start: string;
+  end: string;
+  group: 'day' | 'week' | 'month';
+  buckets: AgendaBucket[];
+  undated: Task[];
+}
+
+// A response together with the server's data version (X-Data-Version),
+// which orders responses that arrive out of order.
+export interface Versioned<T> {
+  data: T;
+  version: number;
 }
 
 const API_URL = 'http://localhost:8000';
 
+const versionOf = (res: Response): number => Number(res.headers.get('X-Data-Version') ?? 0);
+
 export const api = {
   getTasks: async (): Promise<Task[]> => {
     const res = await fetch(`${API_URL}/tasks`);
@@ -52,4 +98,77 @@ export const api = {
     });
     if (!res.ok) throw new Error('Failed to delete task');
   },
+
+  // The same requests, also returning the data version they were served at.
+  getTasksVersioned: async (): Promise<Versioned<Task[]>> => {
+    const res = await fetch(`${API_URL}/tasks`);
+    if (!res.ok) throw new Error('Failed to fetch tasks');
+    return { data: await res.json(), version: versionOf(res) };
+  },
+
+  createTaskVersioned: async (task: TaskCreate): Promise<Versioned<Task>> => {
+    const res = await fetch(`${API_URL}/tasks`, {
+      method: 'POST',
+      headers: { 'Content-Type': 'application/json' },
+      body: JSON.stringify(task),
+    });
+    if (!res.ok) throw new Error('Failed to create task');
+    return { data: await res.json(), version: versionOf(res) };
+  },
+
+  updateTaskVersioned: async (id: string, task: TaskCreate): Promise<Versioned<Task>> => {
+    const res = await fetch(`${API_URL}/tasks/${id}`, {
+      method: 'PUT',
+      headers: { 'Content-Type': 'application/json' },
+      body: JSON.stringify(task),
+    });
+    if (!res.ok) throw new Error('Failed to update task');
+    return { data: await res.json(), version: versionOf(res) };
+  },
+
+  deleteTaskVersioned: async (id: string): Promise<number> => {
+    const res = await fetch(`${API_URL}/tasks/${id}`, {
+      method: 'DELETE',
+    });
+    if (!res.ok) throw new Error('Failed to delete task');
+    return versionOf(res);
+  },
+
+  getAgenda: async (from: string, to: string, group: Agenda['group'] = 'day', includeUndated = false): Promise<Agenda> => {
+    const params = new URLSearchParams({ from, to, group, include_undated: String(includeUndated) });
+    const res = await fetch(`${API_URL}/tasks/agenda?${params}`);
+    if (!res.ok) throw new Error('Failed to fetch agenda');
+    return res.json();
+  },
+
+  getViews: async (): Promise<View[]> => {
+    const res = await fetch(`${API_URL}/views`);
+    if (!res.ok) throw new Error('Failed to fetch views');
+    return res.json();
+  },
+
+  getViewTasks: async (name: string, offset = 0, limit?: number): Promise<Task[]> => {
+    const params = new URLSearchParams({ offset: String(offset) });
+    if (limit !== undefined) params.set('limit', String(limit));
+    const res = await fetch(`${API_URL}/views/${encodeURIComponent(name)}?${params}`);
+    if (!res.ok) throw new Error('Failed to fetch view');
+    return res.json();
+  },
+
+  saveView: async (name: string, view: ViewDefinition): Promise<View> => {
+    const res = await fetch(`${API_URL}/views/${encodeURIComponent(name)}`, {
+      method: 'PUT',
+      headers: { 'Content-Type': 'application/json' },
+      body: JSON.stringify(view),
+    });
+    if (!res.ok) throw new Error('Failed to save view');
+    return res.json();
+  },
+
+  deleteView: async (name: string): Promise<void> => {
+    const res = await fetch(`${API_URL}/views/${encodeURIComponent(name)}`, {
+      method: 'DELETE',
+    });
+    if (!res.ok) throw new Error('Failed to delete view');
+  },
 };
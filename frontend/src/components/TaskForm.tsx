@@ -13,6 +13,7 @@ export const TaskForm: React.FC<TaskFormProps> = ({ initialTask, onSubmit, onCan
     const [priority, setPriority] = useState<TaskCreate['priority']>(initialTask?.priority || 'Medium');
     const [category, setCategory] = useState<TaskCreate['category'] | ''>(initialTask?.category || '');
     const [dueDate, setDueDate] = useState(initialTask?.due_date || '');
+    const [tags, setTags] = useState((initialTask?.tags || []).join(', '));
 
     const handleSubmit = async (e: React.FormEvent) => {
         e.preventDefault();
@@ -23,6 +24,9 @@ export const TaskForm: React.FC<TaskFormProps> = ({ initialTask, onSubmit, onCan
             category: category === '' ? undefined : category,
             due_date: dueDate || undefined,
             completed: initialTask ? initialTask.completed : false,
+            parent_id: initialTask?.parent_id,
+            depends_on: initialTask?.depends_on,
+            tags: tags.split(',').map(tag => tag.trim()).filter(Boolean),
         });
     };
 
@@ -91,6 +95,17 @@ export const TaskForm: React.FC<TaskFormProps> = ({ initialTask, onSubmit, onCan
                 />
             </div>
 
+            <div className="form-group">
+                <label>Tags</label>
+                <input
+                    type="text"
+                    className="form-control"
+                    value={tags}
+                    onChange={e => setTags(e.target.value)}
+                    placeholder="Comma separated, e.g. meeting, urgent"
+                />
+            </div>
+
             <div className="flex gap-2 justify-end mt-4">
                 <button type="button" onClick={onCancel} className="btn btn-ghost">Cancel</button>
                 <button type="submit" className="btn btn-primary">Save Task</button>
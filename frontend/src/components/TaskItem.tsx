@@ -6,6 +6,8 @@ interface TaskItemProps {
     onToggleComplete: (task: Task) => void;
     onDelete: (id: string) => void;
     onEdit: (task: Task) => void;
+    // Not yet confirmed by the server: shown, but not actionable.
+    pending?: boolean;
 }
 
 const getPriorityBadgeClass = (priority: string) => {
@@ -17,7 +19,8 @@ const getPriorityBadgeClass = (priority: string) => {
     }
 };
 
-export const TaskItem: React.FC<TaskItemProps> = ({ task, onToggleComplete, onDelete, onEdit }) => {
+// Memoized so a change to one task re-renders only its own row.
+export const TaskItem = React.memo(({ task, onToggleComplete, onDelete, onEdit, pending = false }: TaskItemProps) => {
     const handleDelete = () => {
         if (window.confirm('Are you sure you want to delete this task?')) {
             onDelete(task.id);
@@ -34,6 +37,9 @@ export const TaskItem: React.FC<TaskItemProps> = ({ task, onToggleComplete, onDe
                         </h3>
                         <span className={getPriorityBadgeClass(task.priority)}>{task.priority}</span>
                         {task.category && <span className="badge" style={{ backgroundColor: '#f1f5f9' }}>{task.category}</span>}
+                        {task.tags?.map(tag => (
+                            <span key={tag} className="badge" style={{ backgroundColor: '#eef2ff' }}>#{tag}</span>
+                        ))}
                     </div>
 
                     {task.description && (
@@ -53,14 +59,15 @@ export const TaskItem: React.FC<TaskItemProps> = ({ task, onToggleComplete, onDe
                     <button
                         onClick={() => onToggleComplete(task)}
                         className={`btn ${task.completed ? 'btn-ghost' : 'btn-primary'}`}
-                        title={task.completed ? "Mark as pending" : "Mark as completed"}
+                        title={pending ? "Saving..." : task.completed ? "Mark as pending" : "Mark as completed"}
+                        disabled={pending}
                     >
                         {task.completed ? 'Undo' : 'Done'}
                     </button>
-                    <button onClick={() => onEdit(task)} className="btn btn-ghost">Edit</button>
-                    <button onClick={handleDelete} className="btn btn-danger">Delete</button>
+                    <button onClick={() => onEdit(task)} className="btn btn-ghost" disabled={pending}>Edit</button>
+                    <button onClick={handleDelete} className="btn btn-danger" disabled={pending}>Delete</button>
                 </div>
             </div>
         </div>
     );
-};
+});
@@ -0,0 +1,97 @@
+import React, { useCallback, useEffect, useLayoutEffect, useMemo, useRef, useState } from 'react';
+
+interface VirtualListProps<T> {
+    items: T[];
+    getKey: (item: T) => string;
+    renderItem: (item: T) => React.ReactNode;
+    estimatedHeight: number;
+    gap?: number;
+    overscan?: number;
+}
+
+// Renders only the rows near the viewport of the window scroll. Row heights
+// are measured once rendered; rows not seen yet count as estimatedHeight.
+export function VirtualList<T>({ items, getKey, renderItem, estimatedHeight, gap = 16, overscan = 5 }: VirtualListProps<T>) {
+    const containerRef = useRef<HTMLDivElement>(null);
+    const heights = useRef(new Map<string, number>());
+    const [measured, setMeasured] = useState(0);
+    const [viewport, setViewport] = useState({ top: 0, height: 0 });
+
+    const offsets = useMemo(() => {
+        // offsets[i] is where row i starts; the last entry is the total height.
+        const result = new Array<number>(items.length + 1);
+        result[0] = 0;
+        items.forEach((item, i) => {
+            result[i + 1] = result[i] + (heights.current.get(getKey(item)) ?? estimatedHeight) + gap;
+        });
+        return result;
+        // measured bumps whenever a row's height changes.
+        // eslint-disable-next-line react-hooks/exhaustive-deps
+    }, [items, getKey, estimatedHeight, gap, measured]);
+
+    const updateViewport = useCallback(() => {
+        const container = containerRef.current;
+        if (!container) return;
+        setViewport({ top: -container.getBoundingClientRect().top, height: window.innerHeight });
+    }, []);
+
+    useLayoutEffect(updateViewport, [updateViewport, items.length]);
+
+    useEffect(() => {
+        window.addEventListener('scroll', updateViewport, { passive: true });
+        window.addEventListener('resize', updateViewport);
+        return () => {
+            window.removeEventListener('scroll', updateViewport);
+            window.removeEventListener('resize', updateViewport);
+        };
+    }, [updateViewport]);
+
+    const observer = useMemo(() => new ResizeObserver(entries => {
+        let changed = false;
+        for (const entry of entries) {
+            const key = (entry.target as HTMLElement).dataset.key!;
+            const height = entry.borderBoxSize[0]?.blockSize ?? entry.contentRect.height;
+            if (heights.current.get(key) !== height) {
+                heights.current.set(key, height);
+                changed = true;
+            }
+        }
+        if (changed) setMeasured(m => m + 1);
+    }), []);
+
+    const measure = useCallback((element: HTMLDivElement) => {
+        observer.observe(element);
+        return () => observer.unobserve(element);
+    }, [observer]);
+
+    // First row ending below the top of the viewport, by binary search.
+    let lo = 0;
+    let hi = items.length;
+    while (lo < hi) {
+        const mid = (lo + hi) >> 1;
+        if (offsets[mid + 1] <= viewport.top) lo = mid + 1;
+        else hi = mid;
+    }
+    const start = Math.max(0, lo - overscan);
+    let end = lo;
+    while (end < items.length && offsets[end] < viewport.top + viewport.height) end++;
+    end = Math.min(items.length, end + overscan);
+
+    return (
+        <div ref={containerRef} style={{ position: 'relative', height: offsets[items.length] }}>
+            {items.slice(start, end).map((item, i) => {
+                const key = getKey(item);
+                return (
+                    <div
+                        key={key}
+                        ref={measure}
+                        data-key={key}
+                        style={{ position: 'absolute', top: offsets[start + i], left: 0, right: 0 }}
+                    >
+                        {renderItem(item)}
+                    </div>
+                );
+            })}
+        </div>
+    );
+}
@@ -0,0 +1,143 @@
+import { useCallback, useEffect, useMemo, useReducer, useRef, useState } from 'react';
+import { api } from './api';
+import type { Task, TaskCreate } from './api';
+
+// Tasks normalized by id. Mutations are applied optimistically and then
+// reconciled with the server's copy; versions[id] is the data version of the
+// last server copy applied, so a late response can't overwrite a newer one.
+interface TaskCacheState {
+  byId: Record<string, Task>;
+  versions: Record<string, number>;
+  deleting: Record<string, true>;
+}
+
+type TaskCacheAction =
+  | { type: 'load'; tasks: Task[]; version: number }
+  | { type: 'optimistic'; task: Task }
+  | { type: 'confirm'; task: Task; version: number; tempId?: string }
+  | { type: 'removed'; id: string; version?: number }
+  | { type: 'rollback'; id: string; expected?: Task; previous?: Task };
+
+const initialState: TaskCacheState = { byId: {}, versions: {}, deleting: {} };
+
+const without = <T>(record: Record<string, T>, id: string): Record<string, T> => {
+  if (!(id in record)) return record;
+  const next = { ...record };
+  delete next[id];
+  return next;
+};
+
+const reducer = (state: TaskCacheState, action: TaskCacheAction): TaskCacheState => {
+  switch (action.type) {
+    case 'load': {
+      const byId: Record<string, Task> = {};
+      const versions: Record<string, number> = {};
+      for (const task of action.tasks) {
+        byId[task.id] = task;
+        versions[task.id] = action.version;
+      }
+      return { byId, versions, deleting: {} };
+    }
+    case 'optimistic':
+      return { ...state, byId: { ...state.byId, [action.task.id]: action.task } };
+    case 'confirm': {
+      const { task, version, tempId } = action;
+      const byId = tempId ? without(state.byId, tempId) : state.byId;
+      if (state.deleting[task.id] || version < (state.versions[task.id] ?? -1)) {
+        return { ...state, byId };
+      }
+      return {
+        ...state,
+        byId: { ...byId, [task.id]: task },
+        versions: { ...state.versions, [task.id]: version },
+      };
+    }
+    case 'removed': {
+      const byId = without(state.byId, action.id);
+      if (action.version === undefined) {
+        return { ...state, byId, deleting: { ...state.deleting, [action.id]: true } };
+      }
+      return {
+        byId,
+        versions: { ...state.versions, [action.id]: action.version },
+        deleting: without(state.deleting, action.id),
+      };
+    }
+    case 'rollback': {
+      // Only undo if nothing newer has replaced the optimistic value meanwhile.
+      const deleting = without(state.deleting, action.id);
+      if (state.byId[action.id] !== action.expected) return { ...state, deleting };
+      const byId = action.previous
+        ? { ...state.byId, [action.id]: action.previous }
+        : without(state.byId, action.id);
+      return { ...state, byId, deleting };
+    }
+  }
+};
+
+let nextTempId = 0;
+
+const TEMP_ID_PREFIX = 'temp-';
+
+// A created task the server hasn't confirmed yet; it has no real id to act on.
+export const isPending = (task: Task): boolean => task.id.startsWith(TEMP_ID_PREFIX);
+
+export const useTaskCache = () => {
+  const [state, dispatch] = useReducer(reducer, initialState);
+  const [isLoading, setIsLoading] = useState(true);
+
+  // Lets the stable callbacks below see the current tasks.
+  const stateRef = useRef(state);
+  useEffect(() => {
+    stateRef.current = state;
+  }, [state]);
+
+  const tasks = useMemo(() => Object.values(state.byId), [state.byId]);
+
+  const load = useCallback(async () => {
+    try {
+      const { data, version } = await api.getTasksVersioned();
+      dispatch({ type: 'load', tasks: data, version });
+    } finally {
+      setIsLoading(false);
+    }
+  }, []);
+
+  const createTask = useCallback(async (taskData: TaskCreate) => {
+    const optimistic: Task = { ...taskData, id: `${TEMP_ID_PREFIX}${++nextTempId}` };
+    dispatch({ type: 'optimistic', task: optimistic });
+    try {
+      const { data, version } = await api.createTaskVersioned(taskData);
+      dispatch({ type: 'confirm', task: data, version, tempId: optimistic.id });
+    } catch (error) {
+      dispatch({ type: 'rollback', id: optimistic.id, expected: optimistic });
+      throw error;
+    }
+  }, []);
+
+  const updateTask = useCallback(async (previous: Task, taskData: TaskCreate) => {
+    const optimistic: Task = { ...previous, ...taskData, id: previous.id };
+    dispatch({ type: 'optimistic', task: optimistic });
+    try {
+      const { data, version } = await api.updateTaskVersioned(previous.id, taskData);
+      dispatch({ type: 'confirm', task: data, version });
+    } catch (error) {
+      dispatch({ type: 'rollback', id: previous.id, expected: optimistic, previous });
+      throw error;
+    }
+  }, []);
+
+  const deleteTask = useCallback(async (id: string) => {
+    const previous = stateRef.current.byId[id];
+    dispatch({ type: 'removed', id });
+    try {
+      const version = await api.deleteTaskVersioned(id);
+      dispatch({ type: 'removed', id, version });
+    } catch (error) {
+      dispatch({ type: 'rollback', id, expected: undefined, previous });
+      throw error;
+    }
+  }, []);
+
+  return { tasks, isLoading, load, createTask, updateTask, deleteTask };
+};